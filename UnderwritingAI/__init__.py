@@ -1,76 +1,158 @@
+import os
 import json
-import base64
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
 import azure.functions as func
 
-from shared.doc_intelligence import analyze_document
-from shared.llm_extract import extract_structured_data
+from shared.doc_intelligence import analyze_document, ocr_cache_stats
+from shared.llm_extract import extract_structured_data, extraction_cache_stats
 from shared.clinical_summary import generate_clinical_summary
 from shared.scoring import calculate_score
+from shared.format_text import generate_underwriting_explanation_llm
+from shared.concurrency import submit, timed
+from shared.tracing import start_trace, wants_debug
+from shared.ingest import IngestError, read_document, track_peak_memory
+from shared.jobs import accepted_response, get_job_queue, wants_async
 
 
-def main(req: func.HttpRequest) -> func.HttpResponse:
+def explanation_llm_enabled():
+    return os.getenv("UNDERWRITING_EXPLANATION_LLM", "0") == "1"
+
+
+def explain_score(structured, score, explanation):
+
+    facts = {k: v for k, v in structured.items() if k != "raw_text"}
 
     try:
-        content_type = req.headers.get("Content-Type", "")
+        return generate_underwriting_explanation_llm(facts, {
+            "score": score,
+            "breakdown": explanation.splitlines()
+        })
+    except Exception:
+        logging.exception("underwriting explanation failed")
+        return None
 
-        # -----------------------
-        # HANDLE JSON (base64)
-        # -----------------------
-        if "application/json" in content_type:
 
-            body = req.get_json()
-            mode = body.get("mode", "both")
-            pdf_base64 = body.get("documentBase64")
+def score_section(score, explanation, narrative=None):
 
-            if not pdf_base64:
-                return func.HttpResponse("Missing documentBase64", status_code=400)
+    text = f"INSURABILITY SCORE: {score}/10\n\nPrimary drivers:\n{explanation}"
 
-            pdf_bytes = base64.b64decode(pdf_base64)
+    if narrative:
+        text += f"\n\nUnderwriting explanation:\n{narrative}"
 
-        # -----------------------
-        # HANDLE RAW PDF
-        # -----------------------
-        else:
-            mode = req.params.get("mode", "both")
-            pdf_bytes = req.get_body()
+    return text
+
+
+def server_timing(timings):
+    return ", ".join(f"{stage};dur={ms}" for stage, ms in timings.items())
+
+
+def process(pdf_bytes, mode):
+    """
+    Returns (response_text, timings) where timings maps stage -> ms.
+    """
+
+    timings = {}
+
+    # -----------------------
+    # PROCESS
+    # -----------------------
+    ocr_text = timed(timings, "ocr", analyze_document, pdf_bytes)
+    structured = timed(timings, "extract", extract_structured_data, ocr_text)
+
+    # -----------------------
+    # SUMMARY
+    # -----------------------
+    if mode == "summary":
+        return timed(timings, "summary", generate_clinical_summary, structured), timings
+
+    # -----------------------
+    # SCORE
+    # -----------------------
+    if mode == "score":
+        score, explanation = timed(timings, "score", calculate_score, structured)
+
+        return score_section(score, explanation), timings
+
+    # -----------------------
+    # BOTH
+    # -----------------------
+    # The summary LLM call and the (optional) explanation LLM call are
+    # independent, so they run side by side; rule scoring is local and
+    # feeds the explanation.
+    with ThreadPoolExecutor(max_workers=2) as pool:
+
+        summary_future = submit(
+            pool, timed, timings, "summary", generate_clinical_summary, structured
+        )
 
-            if not pdf_bytes:
-                return func.HttpResponse("No PDF received", status_code=400)
+        score, explanation = timed(timings, "score", calculate_score, structured)
 
+        narrative_future = None
+
+        if explanation_llm_enabled():
+            narrative_future = submit(
+                pool, timed, timings, "explanation", explain_score, structured, score, explanation
+            )
+
+        summary = summary_future.result()
+        narrative = narrative_future.result() if narrative_future else None
+
+    return f"{summary}\n\n{score_section(score, explanation, narrative)}", timings
+
+
+def run_job(pdf_bytes, mode):
+    return process(pdf_bytes, mode)[0], "text/plain"
+
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+
+    with track_peak_memory("UnderwritingAI request"), start_trace("underwriting") as trace:
+        return handle(req, trace)
+
+
+def handle(req: func.HttpRequest, trace) -> func.HttpResponse:
+
+    try:
         # -----------------------
-        # PROCESS
+        # INGEST (raw PDF, raw base64 or JSON documentBase64)
         # -----------------------
-        ocr_text = analyze_document(pdf_bytes)
-        structured = extract_structured_data(ocr_text)
+        try:
+            pdf_bytes, fields = read_document(req)
+        except IngestError as e:
+            return func.HttpResponse(str(e), status_code=400)
+
+        mode = fields.get("mode") or req.params.get("mode", "both")
 
         # -----------------------
-        # SUMMARY
+        # ASYNC (submit now, poll /api/jobs/{id})
         # -----------------------
-        if mode == "summary":
+        if wants_async(req, fields):
+            job_id = get_job_queue().submit("underwriting", run_job, pdf_bytes, mode)
+            body, headers = accepted_response(job_id)
             return func.HttpResponse(
-                generate_clinical_summary(structured),
-                mimetype="text/plain"
+                body,
+                status_code=202,
+                headers=headers,
+                mimetype="application/json"
             )
 
-        # -----------------------
-        # SCORE
-        # -----------------------
-        if mode == "score":
-            score, explanation = calculate_score(structured)
+        body, timings = process(pdf_bytes, mode)
 
-            return func.HttpResponse(
-                f"INSURABILITY SCORE: {score}/10\n\nPrimary drivers:\n{explanation}",
-                mimetype="text/plain"
-            )
+        headers = {"Server-Timing": server_timing(timings)}
 
-        # -----------------------
-        # BOTH
-        # -----------------------
-        summary = generate_clinical_summary(structured)
-        score, explanation = calculate_score(structured)
+        if wants_debug(req):
+            debug = trace.summary()
+            debug["caches"] = {
+                "ocr": ocr_cache_stats(),
+                "extraction": extraction_cache_stats()
+            }
+            headers["X-Debug-Trace"] = json.dumps(debug)
 
         return func.HttpResponse(
-            f"{summary}\n\nINSURABILITY SCORE: {score}/10\n\nPrimary drivers:\n{explanation}",
+            body,
+            headers=headers,
             mimetype="text/plain"
         )
 
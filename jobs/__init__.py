@@ -0,0 +1,61 @@
+import json
+
+import azure.functions as func
+
+from shared.jobs import FAILED, SUCCEEDED, get_job_queue, is_job_id
+
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+
+    job_id = req.route_params.get("job_id")
+
+    if not is_job_id(job_id):
+        return func.HttpResponse(
+            json.dumps({"error": "Invalid job id"}),
+            status_code=400,
+            mimetype="application/json"
+        )
+
+    job = get_job_queue().get(job_id)
+
+    if job is None:
+        return func.HttpResponse(
+            json.dumps({"error": "Unknown or expired job id"}),
+            status_code=404,
+            mimetype="application/json"
+        )
+
+    # -----------------------
+    # DONE -> the original response body
+    # -----------------------
+    if job["status"] == SUCCEEDED:
+        return func.HttpResponse(
+            job["result"],
+            status_code=200,
+            mimetype=job["mimetype"] or "application/json"
+        )
+
+    status = {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"]
+    }
+
+    if job["status"] == FAILED:
+        status["error"] = job["error"]
+
+        return func.HttpResponse(
+            json.dumps(status),
+            status_code=500,
+            mimetype="application/json"
+        )
+
+    # -----------------------
+    # STILL QUEUED / RUNNING
+    # -----------------------
+    return func.HttpResponse(
+        json.dumps(status),
+        status_code=202,
+        headers={"Retry-After": "5"},
+        mimetype="application/json"
+    )
@@ -1,69 +1,232 @@
 import os
+import copy
 import json
+import time
+import logging
 import traceback
-import base64
+from concurrent.futures import ThreadPoolExecutor
 
 import azure.functions as func
 
-from azure.ai.documentintelligence import DocumentIntelligenceClient
-from azure.core.credentials import AzureKeyCredential
+import fitz  # PyMuPDF
 
-from openai import AzureOpenAI
+from shared.cache import build_cache, content_hash
+from shared.clients import get_openai_client
+from shared.concurrency import bounded_map, env_int, submit, timed
+from shared.compact import compact_pages, compaction_enabled, log_compaction
+from shared.doc_intelligence import analyze_pages
+from shared.ingest import IngestError, read_document, track_peak_memory
+from shared.jobs import accepted_response, get_job_queue, wants_async
+from shared.llm_governor import chat_completion
+from shared.page_cache import iter_pending, normalize_page_text, split_pending
+from shared.page_render import signature_render_options
+from shared.raster import iter_rasterized
+from shared.signature_prefilter import prefilter_enabled
+from shared.tokens import estimate_tokens
+from shared.tracing import count, start_trace, traced, wants_debug
 
-import fitz  # PyMuPDF
+
+# -----------------------
+# Page caches
+# -----------------------
+# Shared by every request in the worker process; see shared.page_cache.
+
+_order_cache = build_cache("PAGE_ORDER", 1024)
+_signature_cache = build_cache("PAGE_SIGNATURE", 1024)
+
+
+def page_cache_stats():
+    return {
+        "orders": _order_cache.stats(),
+        "signatures": _signature_cache.stats()
+    }
+
+
+# -----------------------
+# OCR helper
+# -----------------------
+
+def extract_page_text(pages, page_index):
+
+    return "\n".join(pages[page_index])
 
 
 # -----------------------
-# Clients
+# Vision signature detection
 # -----------------------
 
-def get_doc_client():
+SIGNATURE_PROMPT = """
+Does this page contain a physician or provider signature?
+
+A signature includes:
+- cursive signature
+- stylized scribble
+- signature block
+- electronic signature
 
-    endpoint = os.getenv("DOC_INTEL_ENDPOINT")
-    key = os.getenv("DOC_INTEL_KEY")
+Do NOT classify general handwriting as signature.
 
-    if not endpoint or not key:
-        raise RuntimeError("Missing Document Intelligence environment variables")
+Respond ONLY with JSON:
 
-    return DocumentIntelligenceClient(
-        endpoint=endpoint,
-        credential=AzureKeyCredential(key)
+{
+  "signature_present": true or false,
+  "confidence": 0.0 to 1.0
+}
+"""
+
+
+@traced("vision_call")
+def ask_vision_for_signature(client, deployment, image_url):
+
+    response = chat_completion(
+        client,
+        quota="OPENAI_VISION",
+        model=deployment,
+        messages=[
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": SIGNATURE_PROMPT},
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": image_url
+                        }
+                    }
+                ]
+            }
+        ],
+        temperature=0
     )
 
+    content = response.choices[0].message.content.lower()
+
+    return "true" in content
+
+
+SIGNATURE_BATCH_PROMPT = """
+Each image below is labelled with its page number. For EACH page, decide
+whether it contains a physician or provider signature.
+
+A signature includes:
+- cursive signature
+- stylized scribble
+- signature block
+- electronic signature
+
+Do NOT classify general handwriting as signature.
+
+Respond ONLY with a JSON array, one entry per page:
+
+[
+  {
+    "page_number": 1,
+    "signature_present": true or false,
+    "confidence": 0.0 to 1.0
+  }
+]
+"""
+
+
+def load_json_reply(content):
+
+    content = content.strip()
+
+    if content.startswith("```"):
+        content = content.replace("```json", "").replace("```", "").strip()
+
+    return json.loads(content)
+
 
-def get_openai_client():
+@traced("vision_batch_call")
+def ask_vision_for_signature_batch(client, deployment, batch):
+    """
+    One vision request for several (page_number, image_url) pairs.
+    Returns {page_number: (signature_present, confidence)} for the pages
+    the model answered; pages it skipped are simply absent.
+    """
 
-    endpoint = os.getenv("OPENAI_ENDPOINT")
-    key = os.getenv("OPENAI_KEY")
+    content = [{"type": "text", "text": SIGNATURE_BATCH_PROMPT}]
 
-    if not endpoint or not key:
-        raise RuntimeError("Missing Azure OpenAI environment variables")
+    for page_number, image_url in batch:
+        content.append({"type": "text", "text": f"Page {page_number}:"})
+        content.append({"type": "image_url", "image_url": {"url": image_url}})
 
-    return AzureOpenAI(
-        api_key=key,
-        azure_endpoint=endpoint,
-        api_version="2024-02-15-preview"
+    response = chat_completion(
+        client,
+        quota="OPENAI_VISION",
+        model=deployment,
+        messages=[{"role": "user", "content": content}],
+        temperature=0
     )
 
+    try:
+        entries = load_json_reply(response.choices[0].message.content)
+    except ValueError:
+        return {}
 
-# -----------------------
-# OCR helper
-# -----------------------
+    if isinstance(entries, dict):
+        entries = entries.get("pages", [])
+
+    expected = {page_number for page_number, _ in batch}
+    answers = {}
+
+    for entry in entries:
 
-def extract_page_text(result, page_index):
+        if not isinstance(entry, dict):
+            continue
 
-    page = result.pages[page_index]
+        try:
+            page_number = int(entry.get("page_number"))
+        except (TypeError, ValueError):
+            continue
 
-    if not page.lines:
-        return ""
+        if page_number in expected:
+            answers[page_number] = (
+                bool(entry.get("signature_present")),
+                entry.get("confidence")
+            )
 
-    return "\n".join(line.content for line in page.lines)
+    return answers
 
 
-# -----------------------
-# Vision signature detection
-# -----------------------
+def classify_signature_batch(client, deployment, batch):
+
+    answers = {}
+    calls = 0
+
+    errors = {}
 
+    if len(batch) > 1:
+        calls += 1
+        try:
+            answers = ask_vision_for_signature_batch(client, deployment, batch)
+        except Exception:
+            logging.exception("signature batch failed, retrying pages singly")
+
+    # Single-page batches, and any page a batch reply left out, fall back
+    # to the one-image prompt. A page that still fails after the governor's
+    # retries is reported instead of failing the whole document.
+    for page_number, image_url in batch:
+
+        if page_number in answers:
+            continue
+
+        calls += 1
+
+        try:
+            answers[page_number] = (
+                ask_vision_for_signature(client, deployment, image_url),
+                None
+            )
+        except Exception as e:
+            answers[page_number] = (False, None)
+            errors[page_number] = str(e)
+
+    return answers, calls, errors
+
+
+@traced("detect_signature")
 def detect_signature(pdf_bytes):
 
     client = get_openai_client()
@@ -75,67 +238,147 @@ def detect_signature(pdf_bytes):
 
     doc = fitz.open(stream=pdf_bytes, filetype="pdf")
 
-    signature_found = False
+    render_options = signature_render_options()
+
     signature_pages = []
+    local_decisions = []
+    candidates = []
+    vision_pages = []
 
-    for page_index in range(len(doc)):
+    # Pages the prefilter could not settle, as their images come out of
+    # the raster pool; settled pages are recorded on the way.
+    def rendered_candidates():
 
-        page = doc.load_page(page_index)
+        for page_number, decision, reason, image_url, elapsed_ms in iter_rasterized(
+            pdf_bytes, doc, render_options, prefilter_enabled()
+        ):
 
-        pix = page.get_pixmap(dpi=200)
+            count("ms.rasterize", round(elapsed_ms, 1))
 
-        img_bytes = pix.tobytes("png")
+            if decision != "candidate":
 
-        img_base64 = base64.b64encode(img_bytes).decode()
+                local_decisions.append({
+                    "page": page_number,
+                    "signature_present": decision == "signed",
+                    "reason": reason
+                })
 
-        prompt = """
-Does this page contain a physician or provider signature?
+                if decision == "signed":
+                    signature_pages.append(page_number)
 
-A signature includes:
-- cursive signature
-- stylized scribble
-- signature block
-- electronic signature
+                continue
 
-Do NOT classify general handwriting as signature.
+            count("pages.vision")
+            count("bytes_sent.vision", len(image_url))
 
-Respond ONLY with JSON:
+            candidates.append((page_number, image_url))
 
-{
-  "signature_present": true or false,
-  "confidence": 0.0 to 1.0
-}
-"""
+            yield page_number, image_url
 
-        response = client.chat.completions.create(
-            model=deployment,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{img_base64}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            temperature=0
+    # The rendered image is the key, so a page identical to one already
+    # classified (here or in an earlier document) skips the vision call.
+    keys = {}
+    answers = {}
+
+    batch_size = max(1, env_int("SIGNATURE_BATCH_SIZE", 4))
+
+    batches = []
+    batch_futures = []
+
+    # Batches go to the vision model as soon as they fill up, while the
+    # rest of the document is still being rendered.
+    with ThreadPoolExecutor(max_workers=max(1, env_int("SIGNATURE_MAX_CONCURRENCY", 4))) as pool:
+
+        def send(batch):
+            batches.append(batch)
+            batch_futures.append(
+                submit(pool, classify_signature_batch, client, deployment, batch)
+            )
+
+        batch = []
+
+        for candidate in iter_pending(
+            rendered_candidates(),
+            lambda page: content_hash(deployment, page[1]),
+            _signature_cache,
+            keys,
+            answers,
+            "signature"
+        ):
+
+            batch.append(candidate)
+
+            if len(batch) >= batch_size:
+                send(batch)
+                batch = []
+
+        if batch:
+            send(batch)
+
+        batch_results = [future.result() for future in batch_futures]
+
+    # Answers known before any vision call are real cache hits; a page
+    # that was neither sent nor cached repeats another page of this
+    # document.
+    cached_keys = set(answers)
+
+    candidates.sort()
+    local_decisions.sort(key=lambda decision: decision["page"])
+
+    vision_calls = 0
+    sent = {}
+
+    for batch, (batch_answers, calls, errors) in zip(batches, batch_results):
+
+        vision_calls += calls
+
+        for page_number, image_url in batch:
+
+            signature_present, confidence = batch_answers[page_number]
+
+            answer = {
+                "signature_present": signature_present,
+                "confidence": confidence
+            }
+
+            if page_number in errors:
+                answer["error"] = errors[page_number]
+            else:
+                _signature_cache.set(keys[page_number], answer)
+
+            answers[keys[page_number]] = answer
+            sent[page_number] = len(image_url)
+
+    for page_number, _ in candidates:
+
+        answer = answers[keys[page_number]]
+
+        vision_page = dict(
+            answer,
+            page=page_number,
+            payload_bytes=sent.get(page_number, 0)
         )
 
-        content = response.choices[0].message.content.lower()
+        if page_number not in sent:
+            if keys[page_number] in cached_keys:
+                vision_page["cached"] = True
+            else:
+                vision_page["duplicate"] = True
+
+        vision_pages.append(vision_page)
 
-        if "true" in content:
+        if answer["signature_present"]:
+            signature_pages.append(page_number)
 
-            signature_found = True
-            signature_pages.append(page_index + 1)
+    signature_pages.sort()
 
     return {
-        "signature_present": signature_found,
-        "pages": signature_pages
+        "signature_present": bool(signature_pages),
+        "pages": signature_pages,
+        "vision_calls": vision_calls,
+        "vision_payload_bytes": sum(p["payload_bytes"] for p in vision_pages),
+        "vision_pages": vision_pages,
+        "local_decisions": local_decisions
     }
 
 
@@ -143,13 +386,7 @@ Respond ONLY with JSON:
 # Order extraction
 # -----------------------
 
-def ask_openai_for_fields(page_number, page_text):
-
-    client = get_openai_client()
-
-    deployment = os.getenv("OPENAI_DEPLOYMENT")
-
-    prompt = f"""
+ORDER_PAGE_PROMPT = """
 Return ONLY valid JSON.
 
 {{
@@ -167,7 +404,18 @@ PAGE TEXT:
 {page_text}
 """
 
-    response = client.chat.completions.create(
+
+@traced("extract_page")
+def ask_openai_for_fields(page_number, page_text):
+
+    client = get_openai_client()
+
+    deployment = os.getenv("OPENAI_DEPLOYMENT")
+
+    prompt = ORDER_PAGE_PROMPT.format(page_number=page_number, page_text=page_text)
+
+    response = chat_completion(
+        client,
         model=deployment,
         messages=[
             {
@@ -185,37 +433,257 @@ PAGE TEXT:
     return json.loads(response.choices[0].message.content)
 
 
+ORDER_BATCH_PROMPT = """
+Each page below starts with a "=== PAGE n ===" marker.
+
+Return ONLY a valid JSON array with exactly one object per page, using
+the page number from its marker:
+
+[
+  {
+    "page_number": n,
+    "is_order": true or false,
+    "order_type": "lab" | "imaging" | "referral" | "other",
+    "tests_or_procedures": [],
+    "icd10_codes": [],
+    "ordering_provider": null,
+    "order_date": null,
+    "confidence": 0.0
+  }
+]
+
+PAGES:
+"""
+
+
+# Cached page answers come from either prompt, so an edit to either one
+# changes this version and misses every previously cached answer.
+ORDER_PROMPT_VERSION = content_hash(ORDER_PAGE_PROMPT, ORDER_BATCH_PROMPT)[:16]
+
+
+def pack_pages(pages, token_budget, max_pages):
+    """
+    Group consecutive (page_number, page_text) pairs so each group stays
+    within token_budget prompt tokens. A page larger than the budget
+    gets a group of its own.
+    """
+
+    batches = []
+    current = []
+    current_tokens = 0
+
+    for page in pages:
+
+        page_tokens = estimate_tokens(page[1])
+
+        if current and (
+            current_tokens + page_tokens > token_budget or
+            len(current) >= max_pages
+        ):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+
+        current.append(page)
+        current_tokens += page_tokens
+
+    if current:
+        batches.append(current)
+
+    return batches
+
+
+@traced("extract_page_batch")
+def ask_openai_for_fields_batch(batch):
+
+    client = get_openai_client()
+
+    deployment = os.getenv("OPENAI_DEPLOYMENT")
+
+    prompt = ORDER_BATCH_PROMPT + "\n".join(
+        f"=== PAGE {page_number} ===\n{page_text}\n"
+        for page_number, page_text in batch
+    )
+
+    response = chat_completion(
+        client,
+        model=deployment,
+        messages=[
+            {
+                "role": "system",
+                "content": "Extract structured medical order data."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        temperature=0
+    )
+
+    entries = load_json_reply(response.choices[0].message.content)
+
+    if not isinstance(entries, list):
+        raise ValueError("Batch reply is not a JSON array")
+
+    by_page = {}
+
+    for entry in entries:
+        if isinstance(entry, dict) and "page_number" in entry:
+            try:
+                by_page[int(entry["page_number"])] = entry
+            except (TypeError, ValueError):
+                continue
+
+    return by_page
+
+
+def ask_page_or_report(page_number, page_text):
+
+    try:
+        fields = ask_openai_for_fields(page_number, page_text)
+        if not isinstance(fields, dict):
+            raise ValueError("Page reply is not a JSON object")
+    except Exception as e:
+        # Retries are exhausted; keep the rest of the document.
+        logging.exception("order extraction failed for page %d", page_number)
+        return {"page_number": page_number, "error": str(e)}
+
+    # Results are keyed by the page that was asked for, never by the
+    # number the model echoes back.
+    fields["page_number"] = page_number
+
+    return fields
+
+
+def extract_order_batch(batch):
+
+    if len(batch) == 1:
+        return [ask_page_or_report(*batch[0])]
+
+    try:
+        by_page = ask_openai_for_fields_batch(batch)
+    except Exception:
+        logging.exception("order batch failed, retrying pages singly")
+        by_page = {}
+
+    # A malformed, incomplete or failed batch reply falls back to one
+    # request per missing page.
+    results = []
+
+    for page_number, page_text in batch:
+
+        fields = by_page.get(page_number)
+
+        if fields is None:
+            fields = ask_page_or_report(page_number, page_text)
+        else:
+            fields["page_number"] = page_number
+
+        results.append(fields)
+
+    return results
+
+
 # -----------------------
 # Core scanner
 # -----------------------
 
-def run_scanner(pdf_bytes):
+def extract_orders(ocr_pages):
+
+    if compaction_enabled():
+        # Each page is prompted on its own, so its header stays; only
+        # whitespace and banner/page-counter boilerplate are dropped.
+        compacted = compact_pages(ocr_pages, drop_repeated=False)
+        log_compaction("scan", ocr_pages, compacted)
+        ocr_pages = compacted
+
+    pages = []
 
-    doc_client = get_doc_client()
+    for i in range(len(ocr_pages)):
+
+        page_text = extract_page_text(ocr_pages, i)
+
+        if not page_text.strip():
+            continue
 
-    poller = doc_client.begin_analyze_document(
-        model_id="prebuilt-layout",
-        body=pdf_bytes
+        pages.append((i + 1, page_text))
+
+    deployment = os.getenv("OPENAI_DEPLOYMENT") or ""
+
+    keys, pending, results = split_pending(
+        pages,
+        lambda page: content_hash(deployment, ORDER_PROMPT_VERSION, normalize_page_text(page[1])),
+        _order_cache,
+        "orders"
+    )
+
+    batches = pack_pages(
+        pending,
+        token_budget=env_int("SCAN_BATCH_TOKEN_BUDGET", 3000),
+        max_pages=max(1, env_int("SCAN_BATCH_MAX_PAGES", 8))
     )
 
-    result = poller.result()
+    batch_fields = bounded_map(
+        extract_order_batch,
+        batches,
+        max_workers=env_int("SCAN_MAX_CONCURRENCY", 8)
+    )
+
+    for batch in batch_fields:
+        for fields in batch:
+
+            key = keys[fields["page_number"]]
 
-    signature_info = detect_signature(pdf_bytes)
+            results[key] = fields
+
+            # Failures are not cached, so the page is retried next time.
+            if "error" not in fields:
+                _order_cache.set(key, copy.deepcopy(fields))
+
+    # Every page gets its own copy: run_scanner annotates the dicts, and
+    # duplicate pages would otherwise share one.
+    return [
+        dict(copy.deepcopy(results[keys[page_number]]), page_number=page_number)
+        for page_number, _ in pages
+    ]
+
+
+def run_scanner(pdf_bytes):
+
+    timings = {}
+    start = time.perf_counter()
+
+    # Signature detection only needs the PDF, so it runs alongside
+    # layout analysis and order extraction instead of between them.
+    with ThreadPoolExecutor(max_workers=1) as pool:
+
+        signature_future = submit(
+            pool, timed, timings, "signature_ms", detect_signature, pdf_bytes
+        )
+
+        ocr_pages = timed(timings, "ocr_ms", analyze_pages, pdf_bytes)
+
+        page_fields = timed(timings, "extraction_ms", extract_orders, ocr_pages)
+
+        signature_info = signature_future.result()
+
+    timings["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    logging.info("scan stage timings: %s", json.dumps(timings))
 
     output = {
         "orders": [],
-        "document_signature": signature_info
+        "document_signature": signature_info,
+        "timings": timings
     }
 
-    for i in range(len(result.pages)):
+    for fields in page_fields:
 
-        page_text = extract_page_text(result, i)
-
-        if not page_text.strip():
+        if "error" in fields:
+            output.setdefault("failed_pages", []).append(fields)
             continue
 
-        fields = ask_openai_for_fields(i + 1, page_text)
-
         is_order = fields.get("is_order", False)
 
         has_medical_indicators = (
@@ -265,22 +733,49 @@ def run_scanner(pdf_bytes):
 # Azure entry point
 # -----------------------
 
+def run_job(pdf_bytes):
+    return json.dumps(run_scanner(pdf_bytes)), "application/json"
+
+
 def main(req):
 
-    try:
+    with track_peak_memory("scan request"), start_trace("scan") as trace:
+        return handle(req, trace)
 
-        pdf_bytes = req.get_body()
 
-        if not pdf_bytes:
+def handle(req, trace):
+
+    try:
+
+        try:
+            pdf_bytes, fields = read_document(req)
+        except IngestError as e:
 
             return func.HttpResponse(
-                json.dumps({"error": "No PDF uploaded"}),
+                json.dumps({"error": str(e)}),
                 status_code=400,
                 mimetype="application/json"
             )
 
+        if wants_async(req, fields):
+
+            job_id = get_job_queue().submit("scan", run_job, pdf_bytes)
+
+            body, headers = accepted_response(job_id)
+
+            return func.HttpResponse(
+                body,
+                status_code=202,
+                headers=headers,
+                mimetype="application/json"
+            )
+
         result = run_scanner(pdf_bytes)
 
+        if wants_debug(req):
+            result["debug"] = trace.summary()
+            result["debug"]["caches"] = page_cache_stats()
+
         return func.HttpResponse(
             json.dumps(result),
             status_code=200,
@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+from shared.concurrency import env_int
+
+
+def content_hash(*parts) -> str:
+
+    digest = hashlib.sha256()
+
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        digest.update(part)
+        digest.update(b"\x00")
+
+    return digest.hexdigest()
+
+
+# -----------------------
+# Backends
+# -----------------------
+# A backend only stores (stored_at, value) pairs; TTL and counters
+# live in ResultCache so every backend behaves the same way.
+
+class MemoryBackend:
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DirectoryBackend:
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}.json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return data["stored_at"], data["value"]
+
+    def set(self, key, entry):
+        stored_at, value = entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"stored_at": stored_at, "value": value}, f)
+        os.replace(tmp_path, self._path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def __len__(self):
+        return sum(1 for name in os.listdir(self.root) if name.endswith(".json"))
+
+
+# -----------------------
+# Cache
+# -----------------------
+
+class ResultCache:
+
+    def __init__(self, backend, ttl_seconds=None):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+
+        entry = self.backend.get(key)
+
+        if entry is not None and self.ttl_seconds:
+            stored_at, _ = entry
+            if time.time() - stored_at > self.ttl_seconds:
+                self.backend.delete(key)
+                entry = None
+
+        self._count(entry is not None)
+
+        return None if entry is None else entry[1]
+
+    def set(self, key, value):
+        self.backend.set(key, (time.time(), value))
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self.backend)
+        }
+
+
+def build_cache(prefix, default_max_entries=128):
+    """
+    Build a cache from <prefix>_CACHE_DIR, <prefix>_CACHE_MAX_ENTRIES
+    and <prefix>_CACHE_TTL_SECONDS. Without a directory the cache is an
+    in-memory LRU local to the worker process.
+    """
+
+    directory = os.getenv(f"{prefix}_CACHE_DIR")
+    ttl_seconds = env_int(f"{prefix}_CACHE_TTL_SECONDS", 0) or None
+
+    if directory:
+        backend = DirectoryBackend(directory)
+    else:
+        backend = MemoryBackend(env_int(f"{prefix}_CACHE_MAX_ENTRIES", default_max_entries))
+
+    return ResultCache(backend, ttl_seconds=ttl_seconds)
@@ -0,0 +1,86 @@
+from shared.tokens import estimate_tokens
+
+
+# analyze_document separates pages with a form feed, the usual page
+# separator in extracted text; chunks never split a page unless the page
+# alone is over budget.
+PAGE_BREAK = "\f"
+
+
+def join_pages(pages) -> str:
+    return f"\n{PAGE_BREAK}\n".join("\n".join(lines) for lines in pages if lines)
+
+
+def split_sections(text):
+    """
+    Page-sized sections of OCR text, falling back to blank-line separated
+    blocks for text that carries no page breaks.
+    """
+
+    if PAGE_BREAK in text:
+        sections = text.split(PAGE_BREAK)
+    else:
+        sections = text.split("\n\n")
+
+    return [section.strip("\n") for section in sections if section.strip()]
+
+
+def _split_oversized(section, max_tokens):
+
+    pieces = []
+    current = []
+    current_tokens = 0
+
+    for line in section.split("\n"):
+
+        line_tokens = estimate_tokens(line) + 1
+
+        if current and current_tokens + line_tokens > max_tokens:
+            pieces.append("\n".join(current))
+            current = []
+            current_tokens = 0
+
+        current.append(line)
+        current_tokens += line_tokens
+
+    if current:
+        pieces.append("\n".join(current))
+
+    return pieces
+
+
+def chunk_text(text, max_tokens):
+    """
+    Pack consecutive sections into chunks of at most max_tokens
+    estimated tokens. Returns [text] unchanged when it already fits.
+    """
+
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    for section in split_sections(text):
+
+        section_tokens = estimate_tokens(section)
+
+        pieces = [section] if section_tokens <= max_tokens else _split_oversized(section, max_tokens)
+
+        for piece in pieces:
+
+            piece_tokens = estimate_tokens(piece)
+
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append(f"\n{PAGE_BREAK}\n".join(current))
+                current = []
+                current_tokens = 0
+
+            current.append(piece)
+            current_tokens += piece_tokens
+
+    if current:
+        chunks.append(f"\n{PAGE_BREAK}\n".join(current))
+
+    return chunks
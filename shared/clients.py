@@ -0,0 +1,121 @@
+import os
+import threading
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from azure.ai.documentintelligence import DocumentIntelligenceClient
+from azure.core.credentials import AzureKeyCredential
+from azure.core.pipeline.transport import RequestsTransport
+
+from openai import AzureOpenAI
+
+from shared.concurrency import env_int
+
+
+OPENAI_API_VERSION = "2024-02-15-preview"
+
+
+# -----------------------
+# Registry
+# -----------------------
+# Clients are built once per worker process and reused across
+# invocations, so every page and request shares the same pool of
+# keep-alive connections instead of paying a TLS handshake each time.
+
+_lock = threading.Lock()
+_clients = {}
+
+
+def _get_or_create(key, factory):
+
+    client = _clients.get(key)
+
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = factory()
+                _clients[key] = client
+
+    return client
+
+
+def _pool_size():
+    return env_int("HTTP_POOL_SIZE", 32)
+
+
+def _pooled_session():
+
+    pool_size = _pool_size()
+
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    return session
+
+
+# -----------------------
+# Clients
+# -----------------------
+
+def get_http_session():
+    return _get_or_create(("http",), _pooled_session)
+
+
+def get_openai_client():
+
+    endpoint = os.getenv("OPENAI_ENDPOINT")
+    key = os.getenv("OPENAI_KEY")
+
+    if not endpoint or not key:
+        raise RuntimeError("Missing Azure OpenAI environment variables")
+
+    def build():
+
+        pool_size = _pool_size()
+
+        http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=120
+            ),
+            timeout=httpx.Timeout(120.0, connect=10.0)
+        )
+
+        return AzureOpenAI(
+            api_key=key,
+            azure_endpoint=endpoint,
+            api_version=OPENAI_API_VERSION,
+            http_client=http_client,
+            # retries are owned by shared.llm_governor
+            max_retries=0
+        )
+
+    return _get_or_create(("openai", endpoint, key), build)
+
+
+def get_doc_client():
+
+    endpoint = os.getenv("DOC_INTEL_ENDPOINT")
+    key = os.getenv("DOC_INTEL_KEY")
+
+    if not endpoint or not key:
+        raise RuntimeError("Missing DOC_INTEL_ENDPOINT or DOC_INTEL_KEY")
+
+    def build():
+        return DocumentIntelligenceClient(
+            endpoint=endpoint,
+            credential=AzureKeyCredential(key),
+            transport=RequestsTransport(
+                session=_pooled_session(),
+                session_owner=False
+            )
+        )
+
+    return _get_or_create(("doc_intel", endpoint, key), build)
@@ -1,21 +1,20 @@
 import os
-from openai import AzureOpenAI
+import json
+import logging
+
+from shared.chunking import chunk_text
+from shared.clients import get_openai_client
+from shared.llm_governor import chat_completion
+from shared.concurrency import bounded_map, env_int
+from shared.excerpts import select_excerpts, summary_keywords
+from shared.tokens import estimate_tokens
+from shared.tracing import traced
 
 
 # -----------------------
 # LLM SUMMARY (uses full OCR)
 # -----------------------
-def generate_summary_paragraph(ocr_text):
-
-    client = AzureOpenAI(
-        api_key=os.getenv("OPENAI_KEY"),
-        azure_endpoint=os.getenv("OPENAI_ENDPOINT"),
-        api_version="2024-02-15-preview"
-    )
-
-    prompt = f"""
-Write a clear clinical summary of this medical record.
-
+SUMMARY_REQUIREMENTS = """
 Requirements:
 - 1–2 paragraphs
 - Include key diagnoses and major conditions
@@ -24,12 +23,15 @@ Requirements:
 - Do NOT include underwriting or scoring
 - Do NOT use bullet points
 - Do NOT hallucinate — only use what is in the record
-
-Medical Record:
-{ocr_text}
 """
 
-    response = client.chat.completions.create(
+
+def _complete(prompt):
+
+    client = get_openai_client()
+
+    response = chat_completion(
+        client,
         model=os.getenv("OPENAI_DEPLOYMENT"),
         messages=[
             {"role": "system", "content": "You are a clinical summarization assistant."},
@@ -38,20 +40,127 @@ Medical Record:
         temperature=0.2
     )
 
+    usage = getattr(response, "usage", None)
+
+    if usage is not None:
+        logging.info("summary prompt tokens (reported): %s", usage.prompt_tokens)
+
     return response.choices[0].message.content.strip()
 
 
+@traced("generate_summary_paragraph")
+def generate_summary_paragraph(ocr_text):
+
+    chunks = chunk_text(ocr_text, env_int("SUMMARY_CHUNK_TOKENS", 12000))
+
+    if len(chunks) == 1:
+        return _complete(f"""
+Write a clear clinical summary of this medical record.
+{SUMMARY_REQUIREMENTS}
+Medical Record:
+{ocr_text}
+""")
+
+    # Long records: summarize each chunk concurrently, then combine the
+    # partial summaries in record order.
+    partials = bounded_map(
+        lambda chunk: _complete(f"""
+Write a clear clinical summary of this excerpt from a longer medical record.
+{SUMMARY_REQUIREMENTS}
+Medical Record Excerpt:
+{chunk}
+"""),
+        chunks,
+        max_workers=env_int("SUMMARY_MAX_CONCURRENCY", 4)
+    )
+
+    excerpts = "\n\n".join(
+        f"Part {i + 1}:\n{partial}" for i, partial in enumerate(partials)
+    )
+
+    return _complete(f"""
+Combine these partial summaries of one medical record, given in record
+order, into a single clear clinical summary.
+{SUMMARY_REQUIREMENTS}
+Partial Summaries:
+{excerpts}
+""")
+
+
+# -----------------------
+# LLM SUMMARY (uses structured facts + excerpts)
+# -----------------------
+# Opt-in with SUMMARY_SOURCE=structured; the full-OCR summary stays the
+# default until this one has been compared against it.
+def build_facts_prompt(structured):
+
+    facts = {
+        key: value
+        for key, value in structured.items()
+        if key != "raw_text"
+    }
+
+    excerpts = select_excerpts(
+        structured.get("raw_text", ""),
+        summary_keywords(structured),
+        env_int("SUMMARY_EXCERPT_TOKENS", 1500)
+    )
+
+    excerpt_text = "\n...\n".join(excerpts) if excerpts else "None"
+
+    return f"""
+Write a clear clinical summary of this medical record from the extracted
+facts and the selected record excerpts below.
+{SUMMARY_REQUIREMENTS}
+Extracted Facts:
+{json.dumps(facts, indent=2)}
+
+Record Excerpts:
+{excerpt_text}
+"""
+
+
+@traced("generate_summary_from_facts")
+def generate_summary_from_facts(structured):
+
+    prompt = build_facts_prompt(structured)
+
+    logging.info(
+        "summary input tokens: structured=%d full_ocr=%d",
+        estimate_tokens(prompt),
+        estimate_tokens(structured.get("raw_text", ""))
+    )
+
+    return _complete(prompt)
+
+
+def summary_source():
+
+    source = os.getenv("SUMMARY_SOURCE", "ocr")
+
+    if source not in ("structured", "ocr"):
+        raise RuntimeError("SUMMARY_SOURCE must be 'structured' or 'ocr'")
+
+    return source
+
+
 # -----------------------
 # MAIN SUMMARY BUILDER
 # -----------------------
-def generate_clinical_summary(structured):
+def generate_clinical_summary(structured, summary=None):
+    """
+    Full summary text. Pass summary to reuse an existing narrative
+    paragraph and build only the deterministic sections, with no LLM call.
+    """
 
     patient = structured.get("patient", {})
     meds = structured.get("medications", [])
     providers = structured.get("providers", [])
     diagnoses = structured.get("diagnoses", [])
-    icd = list(set(structured.get("icd_codes", [])))
-    cpt = list(set(structured.get("cpt_codes", [])))
+    # dict.fromkeys dedupes in record order; set() order changes from
+    # one process to the next, which made the output irreproducible.
+    icd = list(dict.fromkeys(structured.get("icd_codes", [])))
+    cpt = list(dict.fromkeys(structured.get("cpt_codes", [])))
     ocr_text = structured.get("raw_text", "")
 
     # -----------------------
@@ -72,10 +181,14 @@ smoking: {patient.get("smoking_status", "Unknown")}
     # -----------------------
     # REAL SUMMARY (LLM)
     # -----------------------
-    try:
-        summary = generate_summary_paragraph(ocr_text)
-    except Exception:
-        summary = "Summary unavailable."
+    if summary is None:
+        try:
+            if summary_source() == "structured":
+                summary = generate_summary_from_facts(structured)
+            else:
+                summary = generate_summary_paragraph(ocr_text)
+        except Exception:
+            summary = "Summary unavailable."
 
     # -----------------------
     # DIAG + ICD
@@ -0,0 +1,129 @@
+import os
+import re
+import logging
+
+from shared.tokens import estimate_tokens
+
+
+# A line has to repeat on at least this many pages, and on this share
+# of all pages, before it is treated as a running header or footer.
+MIN_REPEAT_PAGES = 3
+MIN_REPEAT_RATIO = 0.5
+
+# Short values ("Normal", "Negative", "mg/dL") repeat legitimately in
+# tables and are never treated as headers.
+MIN_REPEAT_LINE_CHARS = 12
+
+# Pieces of fax banners. A bare "3/12" is not a page counter: it is
+# just as likely a blood pressure or a date.
+_PAGE_COUNTER = r"\b(page|pg\.?|p\.)\s*\d+\s*(of|/)\s*\d+"
+_FAX_NUMBER = r"\(?\d{3}\)?[-.\s]*\d{3}[-.\s]\d{4}\b"
+_TIMESTAMP = r"\b\d{1,2}:\d{2}\b"
+
+BOILERPLATE_PATTERNS = [
+    # page counters: "Page 3", "Pg 3 of 12", "Page 3/12", "3 of 12", "- 3 -"
+    re.compile(r"^(page|pg\.?)\s*\d+(\s*(of|/)\s*\d+)?$", re.IGNORECASE),
+    re.compile(r"^\d+\s+of\s+\d+$", re.IGNORECASE),
+    re.compile(r"^-\s*\d+\s*-$"),
+    # fax transmission banners: a fax mention on the same line as a page
+    # counter, or "sent/received via fax" with a fax number or timestamp.
+    # Sentences that merely mention a fax are kept.
+    re.compile(r"\bfax\b.*" + _PAGE_COUNTER, re.IGNORECASE),
+    re.compile(
+        r"^(sent|received)\s+(by|via)\s+fax\b.*(" + _PAGE_COUNTER + "|" + _FAX_NUMBER + "|" + _TIMESTAMP + ")",
+        re.IGNORECASE
+    ),
+    # confidentiality notices
+    re.compile(r"^(confidentiality notice|this (fax|facsimile|message|transmission) (contains|is intended))", re.IGNORECASE),
+    # rules and separators
+    re.compile(r"^[-=_*.~\s]{3,}$"),
+]
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def compaction_enabled():
+    return os.getenv("OCR_COMPACT", "1") != "0"
+
+
+def _clean(line):
+    return _WHITESPACE.sub(" ", line).strip()
+
+
+def _template(line):
+    # Exact repeats only: masking digits would also merge lab values.
+    # Lines that differ just by a page number are caught by the
+    # boilerplate patterns instead.
+    return line.casefold()
+
+
+def is_boilerplate(line):
+    return any(pattern.search(line) for pattern in BOILERPLATE_PATTERNS)
+
+
+def repeated_templates(pages):
+
+    counts = {}
+
+    for lines in pages:
+        for template in {_template(line) for line in lines}:
+            counts[template] = counts.get(template, 0) + 1
+
+    threshold = max(MIN_REPEAT_PAGES, len(pages) * MIN_REPEAT_RATIO)
+
+    return {
+        template for template, count in counts.items()
+        if count >= threshold and len(template) >= MIN_REPEAT_LINE_CHARS
+    }
+
+
+def compact_pages(pages, drop_repeated=True):
+    """
+    Collapse whitespace, drop blank lines and boilerplate (page counters,
+    fax banners, confidentiality notices) and, with drop_repeated, keep
+    only the first copy of headers/footers repeated across pages.
+    """
+
+    pages = [[_clean(line) for line in lines] for lines in pages]
+    pages = [[line for line in lines if line and not is_boilerplate(line)] for lines in pages]
+
+    if drop_repeated and len(pages) >= MIN_REPEAT_PAGES:
+
+        repeated = repeated_templates(pages)
+        seen = set()
+        compacted = []
+
+        for lines in pages:
+
+            kept = []
+
+            for line in lines:
+
+                template = _template(line)
+
+                if template in repeated:
+                    if template in seen:
+                        continue
+                    seen.add(template)
+
+                kept.append(line)
+
+            compacted.append(kept)
+
+        pages = compacted
+
+    return pages
+
+
+def log_compaction(label, before_pages, after_pages):
+
+    before = sum(estimate_tokens("\n".join(lines)) for lines in before_pages)
+    after = sum(estimate_tokens("\n".join(lines)) for lines in after_pages)
+
+    logging.info(
+        "%s prompt compaction: %d -> %d tokens (%.0f%% saved)",
+        label,
+        before,
+        after,
+        100.0 * (before - after) / before if before else 0.0
+    )
@@ -0,0 +1,63 @@
+import os
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+
+def env_int(name, default):
+
+    value = os.getenv(name)
+
+    if not value:
+        return default
+
+    try:
+        return int(value)
+    except ValueError:
+        raise RuntimeError(f"{name} must be an integer")
+
+
+def timed(timings, stage, fn, *args):
+    """
+    Call fn(*args) and record its wall time in milliseconds under
+    timings[stage], even when it raises.
+    """
+
+    start = time.perf_counter()
+
+    try:
+        return fn(*args)
+    finally:
+        timings[stage] = round((time.perf_counter() - start) * 1000, 1)
+
+
+# -----------------------
+# Bounded map
+# -----------------------
+
+def bounded_map(fn, items, max_workers):
+    """
+    Run fn over items with at most max_workers calls in flight.
+    Results are returned in input order. Retries and 429 back-pressure
+    are handled per call by shared.llm_governor.
+    """
+
+    items = list(items)
+
+    if max_workers <= 1 or len(items) <= 1:
+        return [fn(item) for item in items]
+
+    # Each call runs in a copy of the caller's context so request-scoped
+    # state (tracing) follows the work onto the pool threads.
+    calls = [(contextvars.copy_context(), item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(lambda call: call[0].run(fn, call[1]), calls))
+
+
+def submit(pool, fn, *args):
+    """
+    pool.submit that carries the caller's context to the worker thread.
+    """
+
+    return pool.submit(contextvars.copy_context().run, fn, *args)
@@ -1,58 +1,112 @@
-import os
-import base64
+import logging
 
-from azure.ai.documentintelligence import DocumentIntelligenceClient
-from azure.core.credentials import AzureKeyCredential
+from shared.cache import build_cache, content_hash
+from shared.chunking import join_pages
+from shared.clients import get_doc_client
+from shared.compact import compact_pages, compaction_enabled, log_compaction
+from shared.ingest import ingest_bytes
+from shared.text_layer import split_text_layer, subset_pdf, text_layer_enabled
+from shared.tracing import count, span, traced
 
 
-def analyze_document(pdf_input) -> str:
+# Page lines from prebuilt-layout, keyed by the SHA-256 of the PDF bytes.
+# The same document resubmitted with a different mode skips re-analysis.
+_ocr_cache = build_cache("OCR", default_max_entries=64)
 
-    endpoint = os.getenv("DOC_INTEL_ENDPOINT")
-    key = os.getenv("DOC_INTEL_KEY")
 
-    if not endpoint or not key:
-        raise RuntimeError("Missing DOC_INTEL_ENDPOINT or DOC_INTEL_KEY")
+def ocr_cache_stats():
+    return _ocr_cache.stats()
 
-    # Detect base64 vs raw bytes
-    if isinstance(pdf_input, bytes):
 
-        # Check if it's actually base64 text disguised as bytes
-        try:
-            decoded = base64.b64decode(pdf_input, validate=True)
+def run_layout(body) -> list:
 
-            # Check if decoded result looks like PDF
-            if decoded.startswith(b"%PDF"):
-                pdf_bytes = decoded
-            else:
-                pdf_bytes = pdf_input
+    client = get_doc_client()
 
-        except Exception:
-            pdf_bytes = pdf_input
+    with span("ocr_layout", bytes_sent=len(body)):
 
-    elif isinstance(pdf_input, str):
+        poller = client.begin_analyze_document(
+            model_id="prebuilt-layout",
+            body=body
+        )
+
+        result = poller.result()
+
+    count("bytes_sent.ocr", len(body))
+    count("pages.ocr", len(result.pages))
+
+    return [
+        [line.content for line in page.lines] if page.lines else []
+        for page in result.pages
+    ]
+
+
+@traced("analyze_pages")
+def analyze_pages(pdf_bytes) -> list:
+
+    use_text_layer = text_layer_enabled()
 
-        pdf_bytes = base64.b64decode(pdf_input)
+    key = content_hash(pdf_bytes, "text-layer" if use_text_layer else "ocr")
+
+    pages = _ocr_cache.get(key)
+
+    if pages is not None:
+        logging.info("OCR cache hit %s (%s)", key[:12], ocr_cache_stats())
+        count("cache_hits.ocr")
+        return pages
+
+    doc, pages = split_text_layer(pdf_bytes) if use_text_layer else (None, None)
+
+    if pages is None:
+
+        pages = run_layout(pdf_bytes)
 
     else:
-        raise RuntimeError("Unsupported document input type")
 
-    client = DocumentIntelligenceClient(
-        endpoint=endpoint,
-        credential=AzureKeyCredential(key)
-    )
+        # Born-digital pages keep their embedded text; only scanned or
+        # image-only pages are sent to Document Intelligence.
+        scanned = [i for i, lines in enumerate(pages) if lines is None]
+
+        count("pages.text_layer", len(pages) - len(scanned))
+
+        logging.info(
+            "text layer: %d local pages, %d OCR pages",
+            len(pages) - len(scanned),
+            len(scanned)
+        )
 
-    poller = client.begin_analyze_document(
-        model_id="prebuilt-layout",
-        body=pdf_bytes
-    )
+        if scanned:
 
-    result = poller.result()
+            body = pdf_bytes if len(scanned) == len(pages) else subset_pdf(doc, scanned)
+
+            for index, lines in zip(scanned, run_layout(body)):
+                pages[index] = lines
+
+        pages = [lines or [] for lines in pages]
+
+    _ocr_cache.set(key, pages)
+
+    return pages
+
+
+@traced("analyze_document")
+def analyze_document(pdf_input) -> str:
+
+    if isinstance(pdf_input, (bytes, bytearray, memoryview)):
+
+        pdf_bytes = ingest_bytes(pdf_input)
+
+    elif isinstance(pdf_input, str):
+
+        pdf_bytes = ingest_bytes(pdf_input.encode("ascii"))
+
+    else:
+        raise RuntimeError("Unsupported document input type")
 
-    full_text = []
+    pages = analyze_pages(pdf_bytes)
 
-    for page in result.pages:
-        if page.lines:
-            for line in page.lines:
-                full_text.append(line.content)
+    if compaction_enabled():
+        compacted = compact_pages(pages)
+        log_compaction("analyze_document", pages, compacted)
+        pages = compacted
 
-    return "\n".join(full_text)
+    return join_pages(pages)
@@ -0,0 +1,107 @@
+import re
+
+from shared.chunking import split_sections
+from shared.tokens import estimate_tokens
+
+
+# Lines per indexed block of OCR text.
+BLOCK_LINES = 6
+
+# Terms that point at the events a clinical summary is expected to cover.
+EVENT_TERMS = (
+    "admitted", "admission", "hospitalized", "hospitalization", "discharge",
+    "emergency", "surgery", "procedure", "complication", "diagnosed",
+    "assessment", "impression", "plan",
+)
+
+FLAG_TERMS = {
+    "diabetes": ("diabetes", "a1c"),
+    "cancer": ("cancer", "carcinoma", "malignan", "tumor"),
+    "copd": ("copd", "emphysema"),
+    "chf": ("heart failure", "chf"),
+    "heart_disease": ("coronary", "cad", "myocardial"),
+    "stroke": ("stroke", "cva", "tia"),
+    "depression": ("depression",),
+    "anxiety": ("anxiety",),
+    "chest_pain": ("chest pain",),
+}
+
+
+def summary_keywords(structured):
+    """
+    Lower-cased search terms taken from the structured extraction.
+    """
+
+    keywords = set(EVENT_TERMS)
+
+    for diagnosis in structured.get("diagnoses") or []:
+        keywords.add(str(diagnosis).lower())
+
+    for med in structured.get("medications") or []:
+        if isinstance(med, dict) and med.get("name"):
+            keywords.add(str(med["name"]).lower())
+
+    for flag, value in (structured.get("flags") or {}).items():
+        if value:
+            keywords.update(FLAG_TERMS.get(flag, (flag.replace("_", " "),)))
+
+    return {keyword for keyword in keywords if len(keyword) > 2}
+
+
+def index_blocks(ocr_text):
+
+    blocks = []
+
+    for section in split_sections(ocr_text):
+
+        lines = [line for line in section.split("\n") if line.strip()]
+
+        for i in range(0, len(lines), BLOCK_LINES):
+            blocks.append("\n".join(lines[i:i + BLOCK_LINES]))
+
+    return blocks
+
+
+def select_excerpts(ocr_text, keywords, max_tokens):
+    """
+    Highest-scoring OCR blocks for the keywords, within max_tokens and
+    returned in record order.
+    """
+
+    if not keywords:
+        return []
+
+    # Whole words only, as in normalize.TermMatcher: "mi" must not hit
+    # "family" or "admit".
+    pattern = re.compile(
+        r"(?<!\w)(?:"
+        + "|".join(re.escape(keyword) for keyword in sorted(keywords, key=len, reverse=True))
+        + r")(?!\w)",
+        re.IGNORECASE
+    )
+
+    scored = []
+
+    for position, block in enumerate(index_blocks(ocr_text)):
+
+        hits = {match.lower() for match in pattern.findall(block)}
+
+        if hits:
+            scored.append((len(hits), position, block))
+
+    scored.sort(key=lambda item: (-item[0], item[1]))
+
+    selected = []
+    used = 0
+
+    for _, position, block in scored:
+
+        tokens = estimate_tokens(block)
+
+        if used + tokens > max_tokens:
+            continue
+
+        selected.append((position, block))
+        used += tokens
+
+    return [block for _, block in sorted(selected)]
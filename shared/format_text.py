@@ -1,8 +1,10 @@
 import os
 import json
-import requests
 import re
 
+from shared.clients import get_http_session
+from shared.llm_governor import estimate_message_tokens, get_governor
+
 
 def _require_env(name: str) -> str:
     v = os.getenv(name)
@@ -29,9 +31,17 @@ def _azure_openai_chat(messages, temperature=0.2, max_tokens=500) -> str:
         "max_tokens": max_tokens
     }
 
-    r = requests.post(url, headers=headers, json=payload, timeout=45)
-    r.raise_for_status()
-    return r.json()["choices"][0]["message"]["content"]
+    def post():
+        r = get_http_session().post(url, headers=headers, json=payload, timeout=45)
+        r.raise_for_status()
+        return r.json()
+
+    data = get_governor(deployment).call(
+        post,
+        estimate_message_tokens(messages, max_tokens)
+    )
+
+    return data["choices"][0]["message"]["content"]
 
 
 def _paragraphize(text: str) -> str:
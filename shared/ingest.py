@@ -0,0 +1,197 @@
+import os
+import json
+import time
+import logging
+import binascii
+import tracemalloc
+from contextlib import contextmanager
+
+
+PDF_MAGIC = b"%PDF"
+
+# base64 of "%PDF"
+BASE64_PDF_MAGIC = b"JVBER"
+
+SNIFF_BYTES = 1024
+
+BASE64_FIELD = b'"documentBase64"'
+
+
+class IngestError(ValueError):
+    pass
+
+
+# -----------------------
+# Format detection
+# -----------------------
+
+def sniff(data) -> str:
+    """
+    Classify a request body from its first bytes only:
+    "pdf", "base64", "json" or "unknown".
+    """
+
+    head = bytes(memoryview(data)[:SNIFF_BYTES]).lstrip()
+
+    if PDF_MAGIC in head:
+        return "pdf"
+
+    if head.startswith(b"{"):
+        return "json"
+
+    if head.startswith(BASE64_PDF_MAGIC) or head.startswith(b'"' + BASE64_PDF_MAGIC):
+        return "base64"
+
+    return "unknown"
+
+
+# -----------------------
+# Decoding
+# -----------------------
+# Decoding goes straight from a memoryview of the request body into the
+# one bytes object that OCR and rendering then share, so a large packet
+# is never copied as an intermediate str or sliced bytes.
+
+def decode_base64(view) -> bytes:
+
+    try:
+        return binascii.a2b_base64(view)
+    except binascii.Error as e:
+        raise IngestError(f"Invalid base64 document: {e}")
+
+
+def ingest_bytes(data) -> bytes:
+
+    if not data:
+        raise IngestError("No PDF received")
+
+    kind = sniff(data)
+
+    if kind == "pdf":
+        return data if isinstance(data, bytes) else bytes(data)
+
+    if kind == "base64":
+        # a2b_base64 skips whitespace and surrounding quotes on its own.
+        return _require_document(decode_base64(memoryview(data)))
+
+    # Anything else (TIFF, JPEG, ...) goes to Document Intelligence as-is.
+    return data if isinstance(data, bytes) else bytes(data)
+
+
+def ingest_json(body):
+    """
+    Pull documentBase64 out of a JSON body without parsing the whole
+    payload into Python strings. Returns (pdf_bytes, other_fields).
+    """
+
+    key_at = body.find(BASE64_FIELD)
+
+    if key_at < 0:
+        raise IngestError("Missing documentBase64")
+
+    colon_at = body.find(b":", key_at + len(BASE64_FIELD))
+    start = body.find(b'"', colon_at) + 1
+    end = body.find(b'"', start)
+
+    if colon_at < 0 or start <= 0 or end < 0:
+        return _ingest_json_slow(body)
+
+    view = memoryview(body)[start:end]
+
+    # JSON may escape "/" as "\/"; only then fall back to a full parse.
+    if b"\\" in view:
+        return _ingest_json_slow(body)
+
+    try:
+        fields = json.loads(body[:key_at] + b'"documentBase64": null' + body[end + 1:])
+    except ValueError:
+        return _ingest_json_slow(body)
+
+    fields.pop("documentBase64", None)
+
+    return _require_document(decode_base64(view)), fields
+
+
+def _ingest_json_slow(body):
+
+    try:
+        fields = json.loads(body)
+    except ValueError:
+        raise IngestError("Invalid JSON body")
+
+    pdf_base64 = fields.pop("documentBase64", None)
+
+    if not pdf_base64:
+        raise IngestError("Missing documentBase64")
+
+    if not isinstance(pdf_base64, str):
+        raise IngestError("documentBase64 must be a base64 string")
+
+    try:
+        pdf_base64 = pdf_base64.encode("ascii")
+    except UnicodeEncodeError:
+        raise IngestError("Invalid base64 document: non-ASCII characters")
+
+    return _require_document(decode_base64(pdf_base64)), fields
+
+
+def _require_document(document):
+
+    # Same rule as a raw body: any non-PDF format (TIFF, JPEG, ...) is
+    # passed on to Document Intelligence as-is.
+    if not document:
+        raise IngestError("Missing documentBase64")
+
+    return document
+
+
+# -----------------------
+# Request entry point
+# -----------------------
+
+@contextmanager
+def track_peak_memory(label):
+    """
+    Log peak Python heap use for a whole request when INGEST_TRACE_MEMORY=1.
+    """
+
+    if os.getenv("INGEST_TRACE_MEMORY") != "1" or tracemalloc.is_tracing():
+        yield
+        return
+
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        logging.info(
+            "%s peak memory: %.1f MB in %.1f ms",
+            label,
+            peak / (1024 * 1024),
+            (time.perf_counter() - start) * 1000
+        )
+
+
+def read_document(req):
+    """
+    Shared ingestion for both HTTP functions. Accepts a raw PDF body,
+    a raw base64 body, or JSON with documentBase64, and returns
+    (pdf_bytes, fields) where fields holds any other JSON keys.
+    """
+
+    # The Functions host hands over the whole body at once; decoding is
+    # copy-free from here on, but the request itself is not streamed.
+    body = req.get_body()
+
+    if not body:
+        raise IngestError("No PDF received")
+
+    content_type = req.headers.get("Content-Type", "")
+
+    if "application/json" in content_type or sniff(body) == "json":
+        return ingest_json(body)
+
+    return ingest_bytes(body), {}
@@ -0,0 +1,331 @@
+import os
+import re
+import json
+import time
+import secrets
+import sqlite3
+import logging
+import tempfile
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from shared.concurrency import env_int
+from shared.tracing import start_trace
+
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# secrets.token_hex(32); anything else is rejected before it reaches a
+# store, where FileJobStore would join it into a path.
+_JOB_ID = re.compile(r"[0-9a-f]{64}")
+
+
+# -----------------------
+# Auth model
+# -----------------------
+# The jobs endpoint needs a function key, like UnderwritingAI. Results
+# hold full clinical summaries and the job id travels in the URL path,
+# which lands in host and Application Insights request logs, so the id
+# alone must not be enough to read a result. It is still 256 random bits
+# so ids cannot be guessed or enumerated. Results expire after
+# JOB_RESULT_TTL_SECONDS.
+
+# -----------------------
+# Stores
+# -----------------------
+# A job record is a plain dict:
+#   id, kind, status, created_at, updated_at, result, mimetype, error
+# Both stores are local to one worker host. Point JOB_STORE_PATH or
+# JOB_STORE_DIR at shared storage when the app scales out, or add a
+# store with the same methods backed by a database.
+
+INTERRUPTED = "Job was interrupted (worker recycled or timed out)"
+
+class SQLiteJobStore:
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, kind TEXT, status TEXT,"
+                " created_at REAL, updated_at REAL,"
+                " result TEXT, mimetype TEXT, error TEXT)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def create(self, job_id, kind):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, now, now)
+            )
+
+    def update(self, job_id, status, result=None, mimetype=None, error=None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ?,"
+                " result = ?, mimetype = ?, error = ? WHERE id = ?",
+                (status, time.time(), result, mimetype, error, job_id)
+            )
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def expire(self, stale_before, finished_before, active_ids):
+        with self._connect() as conn:
+            stale = [
+                job_id for (job_id,) in conn.execute(
+                    "SELECT id FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                    (QUEUED, RUNNING, stale_before)
+                )
+                if job_id not in active_ids
+            ]
+            conn.executemany(
+                "UPDATE jobs SET status = ?, updated_at = ?, error = ? WHERE id = ?",
+                [(FAILED, time.time(), INTERRUPTED, job_id) for job_id in stale]
+            )
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (SUCCEEDED, FAILED, finished_before)
+            )
+
+
+class FileJobStore:
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, job_id):
+        return os.path.join(self.root, f"{job_id}.json")
+
+    def _write(self, job):
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(job, f)
+        os.replace(tmp_path, self._path(job["id"]))
+
+    def create(self, job_id, kind):
+        now = time.time()
+        self._write({
+            "id": job_id,
+            "kind": kind,
+            "status": QUEUED,
+            "created_at": now,
+            "updated_at": now,
+            "result": None,
+            "mimetype": None,
+            "error": None
+        })
+
+    def update(self, job_id, status, result=None, mimetype=None, error=None):
+        job = self.get(job_id)
+        if job is None:
+            return
+        job.update(
+            status=status,
+            updated_at=time.time(),
+            result=result,
+            mimetype=mimetype,
+            error=error
+        )
+        self._write(job)
+
+    def get(self, job_id):
+        try:
+            with open(self._path(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def expire(self, stale_before, finished_before, active_ids):
+
+        for name in os.listdir(self.root):
+
+            if not name.endswith(".json"):
+                continue
+
+            job = self.get(name[:-len(".json")])
+
+            if job is None:
+                continue
+
+            if job["status"] in (QUEUED, RUNNING):
+                if job["updated_at"] < stale_before and job["id"] not in active_ids:
+                    self.update(job["id"], FAILED, error=INTERRUPTED)
+            elif job["updated_at"] < finished_before:
+                try:
+                    os.remove(self._path(job["id"]))
+                except OSError:
+                    pass
+
+
+def build_job_store():
+
+    kind = os.getenv("JOB_STORE", "sqlite")
+
+    if kind == "sqlite":
+        return SQLiteJobStore(
+            os.getenv("JOB_STORE_PATH")
+            or os.path.join(tempfile.gettempdir(), "orderscanner_jobs.sqlite3")
+        )
+
+    if kind == "file":
+        return FileJobStore(
+            os.getenv("JOB_STORE_DIR")
+            or os.path.join(tempfile.gettempdir(), "orderscanner_jobs")
+        )
+
+    raise RuntimeError("JOB_STORE must be 'sqlite' or 'file'")
+
+
+# -----------------------
+# Queue
+# -----------------------
+
+class JobQueue:
+    """
+    Background worker pool. submit() records the job as queued and
+    returns its id at once; a worker thread runs it and stores the
+    (body, mimetype) it returns, or the error.
+
+    Housekeeping runs at most once a minute, on submit and on poll:
+    queued or running jobs not touched for JOB_TIMEOUT_SECONDS, and not
+    running in this process, are marked failed (their worker is gone),
+    and finished jobs older than JOB_RESULT_TTL_SECONDS are deleted.
+    """
+
+    def __init__(self, store, max_workers, timeout_seconds=1800, result_ttl_seconds=3600):
+        self.store = store
+        self.timeout_seconds = timeout_seconds
+        self.result_ttl_seconds = result_ttl_seconds
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._active = set()
+        self._lock = threading.Lock()
+        self._last_expired = 0.0
+
+    def submit(self, kind, fn, *args):
+
+        self.expire()
+
+        job_id = secrets.token_hex(32)
+
+        self.store.create(job_id, kind)
+
+        with self._lock:
+            self._active.add(job_id)
+
+        self._pool.submit(self._run, job_id, kind, fn, args)
+
+        return job_id
+
+    def get(self, job_id):
+
+        self.expire()
+
+        if not is_job_id(job_id):
+            return None
+
+        return self.store.get(job_id)
+
+    def expire(self, force=False):
+
+        now = time.time()
+
+        with self._lock:
+            if not force and now - self._last_expired < 60:
+                return
+            self._last_expired = now
+            active_ids = set(self._active)
+
+        try:
+            self.store.expire(
+                now - self.timeout_seconds,
+                now - self.result_ttl_seconds,
+                active_ids
+            )
+        except Exception:
+            logging.exception("job store housekeeping failed")
+
+    def _run(self, job_id, kind, fn, args):
+
+        try:
+
+            self.store.update(job_id, RUNNING)
+
+            try:
+                with start_trace(f"job:{kind}"):
+                    body, mimetype = fn(*args)
+            except Exception as e:
+                logging.error("job %s failed:\n%s", job_id, traceback.format_exc())
+                self.store.update(job_id, FAILED, error=str(e))
+                return
+
+            self.store.update(job_id, SUCCEEDED, result=body, mimetype=mimetype)
+
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
+
+
+_lock = threading.Lock()
+_queue = None
+
+
+def get_job_queue():
+
+    global _queue
+
+    if _queue is None:
+        with _lock:
+            if _queue is None:
+                _queue = JobQueue(
+                    build_job_store(),
+                    env_int("JOB_WORKERS", 2),
+                    timeout_seconds=env_int("JOB_TIMEOUT_SECONDS", 1800),
+                    result_ttl_seconds=env_int("JOB_RESULT_TTL_SECONDS", 3600)
+                )
+
+    return _queue
+
+
+def is_job_id(value):
+    return isinstance(value, str) and _JOB_ID.fullmatch(value) is not None
+
+
+def wants_async(req, fields):
+
+    flag = fields.get("async")
+
+    if flag is None:
+        flag = req.params.get("async", "")
+
+    return flag is True or str(flag).lower() in ("1", "true", "yes")
+
+
+def accepted_response(job_id):
+    """
+    Body and headers for the 202 returned when a job is queued.
+    """
+
+    status_url = f"/api/jobs/{job_id}"
+
+    body = json.dumps({
+        "job_id": job_id,
+        "status": QUEUED,
+        "status_url": status_url
+    })
+
+    return body, {"Location": status_url}
@@ -1,21 +1,18 @@
 import os
+import copy
 import json
-from openai import AzureOpenAI
 
+from shared.cache import build_cache, content_hash
+from shared.chunking import chunk_text
+from shared.clients import get_openai_client
+from shared.llm_governor import chat_completion
+from shared.tracing import count, traced
+from shared.concurrency import bounded_map, env_int
 
-def extract_structured_data(ocr_text: str):
-
-    endpoint = os.getenv("OPENAI_ENDPOINT")
-    key = os.getenv("OPENAI_KEY")
-    deployment = os.getenv("OPENAI_DEPLOYMENT")
 
-    client = AzureOpenAI(
-        api_key=key,
-        azure_endpoint=endpoint,
-        api_version="2024-02-15-preview"
-    )
+SYSTEM_PROMPT = "Return JSON only."
 
-    prompt = f"""
+EXTRACTION_PROMPT = """
 Extract structured medical data.
 
 Return ONLY valid JSON.
@@ -74,10 +71,28 @@ OCR TEXT:
 {ocr_text}
 """
 
-    response = client.chat.completions.create(
+# Any edit to the prompts changes this version and so misses every
+# previously cached extraction.
+PROMPT_VERSION = content_hash(SYSTEM_PROMPT, EXTRACTION_PROMPT)[:16]
+
+_extraction_cache = build_cache("EXTRACT", default_max_entries=256)
+
+
+def extraction_cache_stats():
+    return _extraction_cache.stats()
+
+
+def extract_chunk(deployment, ocr_text):
+
+    client = get_openai_client()
+
+    prompt = EXTRACTION_PROMPT.format(ocr_text=ocr_text)
+
+    response = chat_completion(
+        client,
         model=deployment,
         messages=[
-            {"role": "system", "content": "Return JSON only."},
+            {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": prompt}
         ],
         temperature=0
@@ -88,7 +103,149 @@ OCR TEXT:
     if content.startswith("```"):
         content = content.replace("```json", "").replace("```", "").strip()
 
-    structured = json.loads(content)
+    return json.loads(content)
+
+
+# -----------------------
+# Merging chunk results
+# -----------------------
+# Partial extractions are merged in chunk order so the result does not
+# depend on which chunk finished first.
+
+MED_STATUS_RANK = {"active": 2, "inactive": 1}
+
+
+def _key(value):
+    return " ".join(str(value).split()).casefold()
+
+
+def _union(values, normalize=_key):
+
+    seen = set()
+    merged = []
+
+    for value in values:
+
+        if value in (None, ""):
+            continue
+
+        key = normalize(value)
+
+        if key not in seen:
+            seen.add(key)
+            merged.append(value)
+
+    return merged
+
+
+def _merge_records(records, name_field="name"):
+
+    merged = {}
+
+    for record in records:
+
+        if not isinstance(record, dict) or not record.get(name_field):
+            continue
+
+        key = _key(record[name_field])
+        existing = merged.get(key)
+
+        if existing is None:
+            merged[key] = dict(record)
+            continue
+
+        for field, value in record.items():
+            if value not in (None, "") and existing.get(field) in (None, ""):
+                existing[field] = value
+
+    return list(merged.values())
+
+
+def merge_extractions(partials):
+
+    patient = {}
+
+    for partial in partials:
+        for field, value in (partial.get("patient") or {}).items():
+            if value not in (None, "") and patient.get(field) in (None, ""):
+                patient[field] = value
+
+    all_medications = [
+        med for partial in partials for med in partial.get("medications") or []
+        if isinstance(med, dict) and med.get("name")
+    ]
+
+    medications = _merge_records(all_medications)
+
+    # A medication marked active in any chunk stays active.
+    best_status = {}
+
+    for med in all_medications:
+        key = _key(med["name"])
+        if MED_STATUS_RANK.get(med.get("status"), 0) > MED_STATUS_RANK.get(best_status.get(key), 0):
+            best_status[key] = med["status"]
+
+    for med in medications:
+        med["status"] = best_status.get(_key(med["name"]), med.get("status"))
+
+    flags = {}
+
+    for partial in partials:
+        for flag, value in (partial.get("flags") or {}).items():
+            flags[flag] = bool(flags.get(flag)) or bool(value)
+
+    def codes(field):
+        return _union(
+            str(code).strip().upper()
+            for partial in partials for code in partial.get(field) or []
+        )
+
+    return {
+        "patient": patient,
+        "medications": medications,
+        "providers": _merge_records(
+            provider for partial in partials for provider in partial.get("providers") or []
+        ),
+        "diagnoses": _union(
+            diagnosis for partial in partials for diagnosis in partial.get("diagnoses") or []
+        ),
+        "icd_codes": codes("icd_codes"),
+        "cpt_codes": codes("cpt_codes"),
+        "flags": flags
+    }
+
+
+@traced("extract_structured_data")
+def extract_structured_data(ocr_text: str):
+
+    deployment = os.getenv("OPENAI_DEPLOYMENT")
+
+    chunk_tokens = env_int("EXTRACT_CHUNK_TOKENS", 12000)
+
+    # The chunk budget decides between a single-call and a merged
+    # map-reduce result for the same text, so it is part of the key.
+    cache_key = content_hash(ocr_text, PROMPT_VERSION, deployment or "", str(chunk_tokens))
+
+    cached = _extraction_cache.get(cache_key)
+
+    if cached is not None:
+        count("cache_hits.extraction")
+        structured = copy.deepcopy(cached)
+        structured["raw_text"] = ocr_text
+        return structured
+
+    chunks = chunk_text(ocr_text, chunk_tokens)
+
+    if len(chunks) == 1:
+        structured = extract_chunk(deployment, ocr_text)
+    else:
+        structured = merge_extractions(bounded_map(
+            lambda chunk: extract_chunk(deployment, chunk),
+            chunks,
+            max_workers=env_int("EXTRACT_MAX_CONCURRENCY", 4)
+        ))
+
+    _extraction_cache.set(cache_key, copy.deepcopy(structured))
 
     # ✅ ADD THIS LINE
     structured["raw_text"] = ocr_text
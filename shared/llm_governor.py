@@ -0,0 +1,265 @@
+import os
+import time
+import random
+import logging
+import threading
+
+import openai
+import requests
+
+from shared.concurrency import env_int
+from shared.tokens import estimate_tokens
+from shared.tracing import count, span
+
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,  # includes APITimeoutError
+    requests.ConnectionError,
+    requests.Timeout,
+)
+
+# Rough prompt-token cost of one image part, used only for TPM budgeting.
+IMAGE_TOKENS = 800
+
+DEFAULT_COMPLETION_TOKENS = 500
+
+
+# -----------------------
+# Error classification
+# -----------------------
+
+def status_code(exc):
+
+    status = getattr(exc, "status_code", None)
+
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+
+    return status
+
+
+def is_rate_limited(exc):
+    return status_code(exc) == 429
+
+
+def is_retryable(exc):
+    return isinstance(exc, RETRYABLE_ERRORS) or status_code(exc) in RETRYABLE_STATUS
+
+
+def retry_after_seconds(exc):
+
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value:
+            try:
+                return float(value) * scale
+            except ValueError:
+                pass
+
+    return None
+
+
+# -----------------------
+# Limiter
+# -----------------------
+
+class TokenBucket:
+    """
+    Refills at capacity per minute. acquire() blocks until the amount
+    is available; amounts above capacity are clamped so one oversized
+    request cannot wait forever.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount):
+
+        amount = min(float(amount), self.capacity)
+
+        while True:
+
+            with self.lock:
+
+                now = time.monotonic()
+                self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.available >= amount:
+                    self.available -= amount
+                    return
+
+                wait = (amount - self.available) / self.rate
+
+            time.sleep(wait)
+
+
+class Governor:
+    """
+    Per-deployment call gate: RPM and TPM token buckets, a shared pause
+    after any 429, and jittered exponential backoff that honors
+    Retry-After.
+    """
+
+    def __init__(self, rpm=0, tpm=0, max_retries=6, base_delay=1.0, max_delay=60.0):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+
+    def _wait_for_pause(self):
+        while True:
+            with self._lock:
+                delay = self._resume_at - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def _pause(self, seconds):
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    def backoff(self, attempt, exc):
+
+        delay = retry_after_seconds(exc)
+
+        if delay is None:
+            ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+            delay = random.uniform(ceiling / 2, ceiling)
+
+        return delay
+
+    def call(self, fn, estimated_tokens=0):
+
+        attempt = 0
+
+        while True:
+
+            self._wait_for_pause()
+
+            if self.requests:
+                self.requests.acquire(1)
+
+            if self.tokens and estimated_tokens:
+                self.tokens.acquire(estimated_tokens)
+
+            try:
+                return fn()
+
+            except Exception as e:
+
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+
+                delay = self.backoff(attempt, e)
+
+                # A 429 means the whole deployment is over quota, so every
+                # caller waits, not just this one.
+                if is_rate_limited(e):
+                    self._pause(delay)
+
+                logging.warning(
+                    "LLM call failed (%s), retry %d/%d in %.1fs",
+                    status_code(e) or type(e).__name__,
+                    attempt + 1,
+                    self.max_retries,
+                    delay
+                )
+
+                count("llm_retries")
+
+                time.sleep(delay)
+                attempt += 1
+
+
+# -----------------------
+# Registry
+# -----------------------
+
+_lock = threading.Lock()
+_governors = {}
+
+
+def get_governor(deployment, quota="OPENAI"):
+    """
+    One governor per deployment per worker. Quotas come from
+    <quota>_RPM and <quota>_TPM (0 or unset = unlimited), e.g.
+    OPENAI_RPM / OPENAI_TPM or OPENAI_VISION_RPM / OPENAI_VISION_TPM.
+    """
+
+    key = (deployment, quota)
+
+    governor = _governors.get(key)
+
+    if governor is None:
+        with _lock:
+            governor = _governors.get(key)
+            if governor is None:
+                governor = Governor(
+                    rpm=env_int(f"{quota}_RPM", 0),
+                    tpm=env_int(f"{quota}_TPM", 0),
+                    max_retries=env_int("LLM_MAX_RETRIES", 6)
+                )
+                _governors[key] = governor
+
+    return governor
+
+
+def estimate_message_tokens(messages, max_tokens=None):
+
+    total = max_tokens or DEFAULT_COMPLETION_TOKENS
+
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            total += estimate_tokens(content)
+        else:
+            for part in content or []:
+                if part.get("type") == "image_url":
+                    total += IMAGE_TOKENS
+                else:
+                    total += estimate_tokens(part.get("text", ""))
+
+    return total
+
+
+def chat_completion(client, quota="OPENAI", **kwargs):
+    """
+    client.chat.completions.create(**kwargs) behind the deployment's
+    governor.
+    """
+
+    deployment = kwargs.get("model") or os.getenv("OPENAI_DEPLOYMENT")
+
+    governor = get_governor(deployment, quota)
+
+    with span("llm_call", deployment=deployment) as attributes:
+
+        response = governor.call(
+            lambda: client.chat.completions.create(**kwargs),
+            estimate_message_tokens(kwargs.get("messages", []), kwargs.get("max_tokens"))
+        )
+
+        usage = getattr(response, "usage", None)
+
+        if usage is not None:
+            attributes["prompt_tokens"] = usage.prompt_tokens
+            attributes["completion_tokens"] = usage.completion_tokens
+            count("tokens.prompt", usage.prompt_tokens)
+            count("tokens.completion", usage.completion_tokens)
+
+    count("llm_calls")
+
+    return response
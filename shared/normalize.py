@@ -1,28 +1,204 @@
 import re
 
-def normalize_medical_facts(text: str) -> dict:
-    text_lower = text.lower()
 
-    conditions = []
-    medications = []
+# -----------------------
+# Vocabulary
+# -----------------------
+# canonical name -> (category, synonyms and abbreviations). Matching is
+# on whole words only, and any run of whitespace in the text matches a
+# space in a synonym, so OCR line breaks inside a term do not hide it.
+# Synonyms are case-insensitive, except all-caps abbreviations that are
+# also ordinary words or initials ("MI", "ASA"), which must appear in
+# capitals.
+
+MEDICAL_TERMS = {
+    # Conditions
+    "Diabetes Mellitus": ("condition", (
+        "diabetes", "diabetes mellitus", "diabetic", "DM", "dm2", "t2dm", "t1dm",
+        "type 2 diabetes", "type 1 diabetes", "niddm", "iddm",
+    )),
+    "Hypertension": ("condition", (
+        "hypertension", "htn", "high blood pressure", "elevated blood pressure",
+    )),
+    "Asthma": ("condition", ("asthma", "reactive airway disease")),
+    "COPD": ("condition", (
+        "copd", "chronic obstructive pulmonary disease", "emphysema", "chronic bronchitis",
+    )),
+    "Congestive Heart Failure": ("condition", (
+        "chf", "congestive heart failure", "heart failure", "hfref", "hfpef",
+    )),
+    "Coronary Artery Disease": ("condition", (
+        "CAD", "coronary artery disease", "ischemic heart disease",
+    )),
+    "Myocardial Infarction": ("condition", ("myocardial infarction", "MI", "heart attack", "stemi", "nstemi")),
+    "Atrial Fibrillation": ("condition", ("atrial fibrillation", "afib", "a-fib", "a fib")),
+    "Stroke": ("condition", ("stroke", "cva", "cerebrovascular accident", "TIA", "transient ischemic attack")),
+    "Chronic Kidney Disease": ("condition", ("ckd", "chronic kidney disease", "chronic renal insufficiency")),
+    "Hyperlipidemia": ("condition", (
+        "hyperlipidemia", "hld", "dyslipidemia", "hypercholesterolemia", "high cholesterol",
+    )),
+    "Obesity": ("condition", ("obesity", "obese", "morbid obesity")),
+    "Depression": ("condition", ("depression", "mdd", "major depressive disorder")),
+    "Anxiety": ("condition", ("anxiety", "GAD", "generalized anxiety disorder")),
+    "Cancer": ("condition", ("cancer", "malignancy", "carcinoma", "neoplasm", "lymphoma", "leukemia")),
+    "Sleep Apnea": ("condition", ("sleep apnea", "OSA", "obstructive sleep apnea")),
+    "Hypothyroidism": ("condition", ("hypothyroidism", "hypothyroid")),
+
+    # Medications
+    "Metformin": ("medication", ("metformin", "glucophage")),
+    "Insulin": ("medication", (
+        "insulin", "insulin glargine", "lantus", "humalog", "novolog", "levemir",
+    )),
+    "Lisinopril": ("medication", ("lisinopril", "zestril", "prinivil")),
+    "Losartan": ("medication", ("losartan", "cozaar")),
+    "Amlodipine": ("medication", ("amlodipine", "norvasc")),
+    "Hydrochlorothiazide": ("medication", ("hydrochlorothiazide", "hctz")),
+    "Metoprolol": ("medication", ("metoprolol", "lopressor", "toprol", "toprol xl")),
+    "Atorvastatin": ("medication", ("atorvastatin", "lipitor")),
+    "Rosuvastatin": ("medication", ("rosuvastatin", "crestor")),
+    "Simvastatin": ("medication", ("simvastatin", "zocor")),
+    "Aspirin": ("medication", ("aspirin", "ASA")),
+    "Clopidogrel": ("medication", ("clopidogrel", "plavix")),
+    "Warfarin": ("medication", ("warfarin", "coumadin")),
+    "Apixaban": ("medication", ("apixaban", "eliquis")),
+    "Furosemide": ("medication", ("furosemide", "lasix")),
+    "Levothyroxine": ("medication", ("levothyroxine", "synthroid")),
+    "Albuterol": ("medication", ("albuterol", "proair", "ventolin")),
+    "Sertraline": ("medication", ("sertraline", "zoloft")),
+    "Omeprazole": ("medication", ("omeprazole", "prilosec")),
+    "Semaglutide": ("medication", ("semaglutide", "ozempic", "wegovy")),
+}
+
+
+# -----------------------
+# Matcher
+# -----------------------
+
+def _normalize_term(term, case_sensitive=False):
+
+    term = " ".join(term.split())
+
+    return term if case_sensitive else term.lower()
+
+
+def _is_case_sensitive(term):
+    return term.isupper()
+
+
+def _trie_pattern(node):
+    """
+    Regex for a character trie. Shared prefixes are matched once, so a
+    single pass over the text costs about the same for ten terms or
+    a thousand.
+    """
+
+    branches = []
+
+    for char in sorted(key for key in node if key):
+        piece = r"\s+" if char == " " else re.escape(char)
+        branches.append(piece + _trie_pattern(node[char]))
+
+    if not branches:
+        return ""
+
+    optional = "" in node
+
+    if len(branches) == 1 and not optional:
+        return branches[0]
+
+    return "(?:" + "|".join(branches) + ")" + ("?" if optional else "")
+
+
+class TermMatcher:
+    """
+    All synonyms of a vocabulary compiled into one regex. find() scans
+    the text once and returns every match with its offsets.
+    """
+
+    def __init__(self, terms=MEDICAL_TERMS):
+
+        self.lookup = {}
+        tries = {False: {}, True: {}}
 
-    # Very simple starters (we can expand later)
-    if "diabetes" in text_lower:
-        conditions.append("Diabetes Mellitus")
+        for canonical, (category, synonyms) in terms.items():
+            for synonym in (canonical,) + tuple(synonyms):
 
-    if "hypertension" in text_lower or "htn" in text_lower:
-        conditions.append("Hypertension")
+                case_sensitive = _is_case_sensitive(synonym)
+                key = _normalize_term(synonym, case_sensitive)
 
-    if "asthma" in text_lower:
-        conditions.append("Asthma")
+                self.lookup.setdefault((case_sensitive, key), (canonical, category))
 
-    if "metformin" in text_lower:
-        medications.append("Metformin")
+                node = tries[case_sensitive]
+                for char in key:
+                    node = node.setdefault(char, {})
+                node[""] = True
+
+        # An empty branch would match everywhere; (?!) never matches.
+        branches = [
+            r"(?P<any>(?i:" + (_trie_pattern(tries[False]) or "(?!)") + "))",
+            r"(?P<exact>" + (_trie_pattern(tries[True]) or "(?!)") + ")",
+        ]
+
+        # Lookarounds rather than \b so terms that start or end with
+        # punctuation still need a non-word character beside them.
+        self.pattern = re.compile(
+            r"(?<!\w)(?:" + "|".join(branches) + r")(?!\w)"
+        )
+
+    def find(self, text):
+
+        matches = []
+
+        for match in self.pattern.finditer(text):
+
+            case_sensitive = match.group("any") is None
+
+            canonical, category = self.lookup[
+                (case_sensitive, _normalize_term(match.group(), case_sensitive))
+            ]
+
+            matches.append({
+                "term": canonical,
+                "category": category,
+                "text": match.group(),
+                "start": match.start(),
+                "end": match.end()
+            })
+
+        return matches
+
+
+_matcher = None
+
+
+def get_matcher():
+
+    global _matcher
+
+    if _matcher is None:
+        _matcher = TermMatcher()
+
+    return _matcher
+
+
+def normalize_medical_facts(text: str) -> dict:
+    """
+    Conditions and medications named in text, in order of first mention,
+    with every match as evidence.
+    """
+
+    evidence = get_matcher().find(text)
+
+    conditions = []
+    medications = []
 
-    if "insulin" in text_lower:
-        medications.append("Insulin")
+    for match in evidence:
+        found = conditions if match["category"] == "condition" else medications
+        if match["term"] not in found:
+            found.append(match["term"])
 
     return {
-        "conditions": list(set(conditions)),
-        "medications": list(set(medications))
+        "conditions": conditions,
+        "medications": medications,
+        "evidence": evidence
     }
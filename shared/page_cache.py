@@ -0,0 +1,58 @@
+from shared.tracing import count
+
+
+# -----------------------
+# Page-level results
+# -----------------------
+# Packets often carry the same page more than once (a requisition faxed
+# twice, repeated cover sheets). Page results are cached by content so a
+# page already answered in this or an earlier request costs no model
+# call, and identical pages inside one document share a single call.
+
+def normalize_page_text(text):
+    return " ".join(text.split())
+
+
+def iter_pending(pages, key_of, cache, keys, known, label):
+    """
+    Yield, as (page_number, payload) pairs arrive, the first page of
+    every key the cache cannot answer. keys (page number -> key) and
+    known (key -> cached value) are filled in along the way.
+    """
+
+    seen = set()
+    total = 0
+
+    for page in pages:
+
+        total += 1
+
+        key = keys[page[0]] = key_of(page)
+
+        if key in seen:
+            continue
+
+        seen.add(key)
+
+        value = cache.get(key)
+
+        if value is None:
+            yield page
+        else:
+            known[key] = value
+            count(f"cache_hits.{label}")
+
+    count(f"pages.deduplicated.{label}", total - len(seen))
+
+
+def split_pending(pages, key_of, cache, label):
+    """
+    List form of iter_pending. Returns (keys, pending, known).
+    """
+
+    keys = {}
+    known = {}
+
+    pending = list(iter_pending(pages, key_of, cache, keys, known, label))
+
+    return keys, pending, known
@@ -0,0 +1,79 @@
+import os
+import base64
+
+import fitz  # PyMuPDF
+
+from shared.concurrency import env_int
+from shared.signature_prefilter import signature_clip
+
+
+MIME_TYPES = {
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+}
+
+
+def render_page(page, dpi=200, clip=None, grayscale=False, fmt="png", jpeg_quality=70):
+    """
+    Rasterize one PyMuPDF page (optionally only the clip rectangle)
+    and return (image_bytes, mime_type).
+    """
+
+    if fmt not in MIME_TYPES:
+        raise RuntimeError(f"Unsupported image format: {fmt}")
+
+    pix = page.get_pixmap(
+        dpi=dpi,
+        clip=clip,
+        colorspace=fitz.csGRAY if grayscale else fitz.csRGB
+    )
+
+    if fmt == "jpeg":
+        return pix.tobytes("jpeg", jpg_quality=jpeg_quality), MIME_TYPES[fmt]
+
+    return pix.tobytes("png"), MIME_TYPES[fmt]
+
+
+def signature_render_options():
+    """
+    Rendering settings for signature detection.
+
+    SIGNATURE_RENDER_MODE=full keeps the original full-page 200 DPI PNG;
+    the default "crop" mode sends grayscale JPEG crops of the likely
+    signature regions at a lower DPI.
+    """
+
+    mode = os.getenv("SIGNATURE_RENDER_MODE", "crop")
+
+    if mode not in ("full", "crop"):
+        raise RuntimeError("SIGNATURE_RENDER_MODE must be 'full' or 'crop'")
+
+    crop = mode == "crop"
+
+    return {
+        "crop": crop,
+        "dpi": env_int("SIGNATURE_RENDER_DPI", 110 if crop else 200),
+        "grayscale": crop,
+        "fmt": os.getenv("SIGNATURE_IMAGE_FORMAT", "jpeg" if crop else "png"),
+        "jpeg_quality": env_int("SIGNATURE_JPEG_QUALITY", 70),
+    }
+
+
+def encode_signature_image(page, options):
+    """
+    Render a page with signature_render_options() and return it as a
+    base64 data URL for the vision model.
+    """
+
+    clip = signature_clip(page) if options["crop"] else None
+
+    img_bytes, mime_type = render_page(
+        page,
+        dpi=options["dpi"],
+        clip=clip,
+        grayscale=options["grayscale"],
+        fmt=options["fmt"],
+        jpeg_quality=options["jpeg_quality"]
+    )
+
+    return f"data:{mime_type};base64,{base64.b64encode(img_bytes).decode()}"
@@ -1,20 +1,59 @@
 import base64
-from pdf2image import convert_from_bytes
-from io import BytesIO
 
+import fitz  # PyMuPDF
 
-def pdf_bytes_to_base64_images(pdf_bytes: bytes):
+from shared.page_render import render_page
 
-    images = convert_from_bytes(pdf_bytes, dpi=200)
 
-    base64_images = []
+# -----------------------
+# Page images
+# -----------------------
+# Pages are rendered one at a time and handed to the caller before the
+# next one is drawn, so memory stays at roughly one page image however
+# long the document is.
 
-    for image in images:
-        buffer = BytesIO()
-        image.save(buffer, format="PNG")
+def iter_page_images(pdf_bytes, dpi=200, first_page=1, last_page=None,
+                     grayscale=False, fmt="png", jpeg_quality=70):
+    """
+    Yield (page_number, image_bytes, mime_type) for pages first_page to
+    last_page (1-based, inclusive; None means the last page).
+    """
 
-        base64_images.append(
-            base64.b64encode(buffer.getvalue()).decode()
-        )
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
 
-    return base64_images
+    try:
+
+        last_page = len(doc) if last_page is None else min(last_page, len(doc))
+
+        for page_index in range(max(first_page, 1) - 1, last_page):
+
+            img_bytes, mime_type = render_page(
+                doc.load_page(page_index),
+                dpi=dpi,
+                grayscale=grayscale,
+                fmt=fmt,
+                jpeg_quality=jpeg_quality
+            )
+
+            yield page_index + 1, img_bytes, mime_type
+
+    finally:
+        doc.close()
+
+
+def iter_base64_images(pdf_bytes, **options):
+    """
+    iter_page_images, base64-encoded. Accepts the same options.
+    """
+
+    for _, img_bytes, _ in iter_page_images(pdf_bytes, **options):
+        yield base64.b64encode(img_bytes).decode()
+
+
+def pdf_bytes_to_base64_images(pdf_bytes: bytes, **options):
+    """
+    Every page as a base64 PNG string. Holds the whole document's images
+    at once; prefer iter_base64_images for anything that can stream.
+    """
+
+    return list(iter_base64_images(pdf_bytes, **options))
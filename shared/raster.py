@@ -0,0 +1,209 @@
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import fitz  # PyMuPDF
+
+from shared.concurrency import env_int
+from shared.page_render import encode_signature_image
+from shared.signature_prefilter import classify_page
+
+
+# -----------------------
+# Page work
+# -----------------------
+# Runs in the request thread or in a pool process. Each result is
+# (page_number, decision, reason, image_url, elapsed_ms); image_url is
+# only set for pages that still need the vision model.
+
+def rasterize_pages(doc, page_indexes, options, prefilter):
+
+    results = []
+
+    for page_index in page_indexes:
+
+        start = time.perf_counter()
+
+        page = doc.load_page(page_index)
+
+        decision, reason, image_url = "candidate", None, None
+
+        if prefilter:
+            decision, reason = classify_page(page)
+
+        if decision == "candidate":
+            image_url = encode_signature_image(page, options)
+
+        results.append((
+            page_index + 1,
+            decision,
+            reason,
+            image_url,
+            (time.perf_counter() - start) * 1000
+        ))
+
+    return results
+
+
+# -----------------------
+# Worker side
+# -----------------------
+# A worker copies the PDF out of shared memory the first time it sees a
+# document and keeps it open for that document's later chunks. It holds
+# one document at a time, so memory per worker is bounded at one decoded
+# PDF: a chunk of another document replaces it, and the worker that runs
+# a document's last chunk closes it straight away.
+
+_worker_doc = None
+_worker_doc_name = None
+
+
+def _worker_document(name, size):
+
+    global _worker_doc, _worker_doc_name
+
+    if _worker_doc_name == name:
+        return _worker_doc
+
+    _release_worker_document()
+
+    shm = shared_memory.SharedMemory(name=name)
+
+    # Pool processes share the parent's resource tracker, so attaching
+    # here does not register a second owner; the parent unlinks.
+    try:
+        pdf_bytes = bytes(shm.buf[:size])
+    finally:
+        shm.close()
+
+    _worker_doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    _worker_doc_name = name
+
+    return _worker_doc
+
+
+def _release_worker_document():
+
+    global _worker_doc, _worker_doc_name
+
+    if _worker_doc is not None:
+        _worker_doc.close()
+
+    _worker_doc = None
+    _worker_doc_name = None
+
+
+def _rasterize_shared(name, size, page_indexes, options, prefilter, last):
+
+    try:
+        return rasterize_pages(_worker_document(name, size), page_indexes, options, prefilter)
+    finally:
+        if last:
+            _release_worker_document()
+
+
+# -----------------------
+# Pool
+# -----------------------
+
+_lock = threading.Lock()
+_pool = None
+
+
+def raster_workers():
+    return env_int("RASTER_WORKERS", os.cpu_count() or 1)
+
+
+def get_raster_pool():
+    """
+    Process pool shared by every request in the worker. Processes are
+    spawned rather than forked because the host process runs threads.
+    """
+
+    global _pool
+
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=raster_workers(),
+                    mp_context=multiprocessing.get_context(
+                        os.getenv("RASTER_START_METHOD", "spawn")
+                    )
+                )
+
+    return _pool
+
+
+def _reset_raster_pool():
+
+    global _pool
+
+    with _lock:
+        _pool = None
+
+
+def iter_rasterized(pdf_bytes, doc, options, prefilter):
+    """
+    Yield page results as soon as they are ready, in completion order.
+    With RASTER_WORKERS > 1 pages are rendered in the process pool in
+    chunks of RASTER_CHUNK_PAGES; otherwise in the calling thread.
+    """
+
+    page_count = len(doc)
+    chunk_pages = max(1, env_int("RASTER_CHUNK_PAGES", 2))
+
+    if raster_workers() <= 1 or page_count <= chunk_pages:
+        for page_index in range(page_count):
+            yield from rasterize_pages(doc, [page_index], options, prefilter)
+        return
+
+    shm = shared_memory.SharedMemory(create=True, size=len(pdf_bytes))
+
+    try:
+
+        shm.buf[:len(pdf_bytes)] = pdf_bytes
+
+        pool = get_raster_pool()
+
+        firsts = range(0, page_count, chunk_pages)
+
+        futures = [
+            pool.submit(
+                _rasterize_shared,
+                shm.name,
+                len(pdf_bytes),
+                list(range(first, min(first + chunk_pages, page_count))),
+                options,
+                prefilter,
+                first == firsts[-1]
+            )
+            for first in firsts
+        ]
+
+        done = set()
+
+        try:
+            for future in as_completed(futures):
+                for result in future.result():
+                    done.add(result[0])
+                    yield result
+        except BrokenProcessPool:
+            # A crashed worker takes the pool with it; finish this document
+            # in-thread and let the next request build a fresh pool.
+            logging.exception("raster pool broke, rendering remaining pages in-thread")
+            _reset_raster_pool()
+            remaining = [i for i in range(page_count) if i + 1 not in done]
+            yield from rasterize_pages(doc, remaining, options, prefilter)
+        finally:
+            for future in futures:
+                future.cancel()
+
+    finally:
+        shm.close()
+        shm.unlink()
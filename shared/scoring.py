@@ -1,61 +1,64 @@
-def calculate_score(structured):
+# -----------------------
+# Rules
+# -----------------------
+# Declared as data so the single-case scorer below and the batch engine
+# in shared.scoring_engine apply exactly the same rules. Order matters:
+# drivers are listed, and points summed, in this order.
 
-    flags = structured.get("flags", {})
-    meds = structured.get("medications", [])
+# Each condition rule fires when any of its flags is set.
+CONDITION_RULES = [
+    {"flags": ("cancer",), "points": 5.0, "label": "Active cancer"},
+    {"flags": ("diabetes",), "points": 2.5, "label": "Diabetes"},
+    {"flags": ("chf",), "points": 3.0, "label": "Congestive heart failure"},
+    {"flags": ("copd",), "points": 2.0, "label": "COPD"},
+    {"flags": ("heart_disease",), "points": 2.0, "label": "Heart disease"},
+    {"flags": ("stroke",), "points": 2.5, "label": "Stroke history"},
+    {"flags": ("chest_pain",), "points": 1.5, "label": "Chest Pain"},
+    {"flags": ("depression", "anxiety"), "points": 1.5, "label": "Mental health condition"},
+]
+
+# Medication complexity: points per listed medication.
+MEDICATION_POINTS = 0.25
+
+MAX_SCORE = 10.0
 
-    score = 0.0
-    drivers = []
 
-    # helper to keep everything consistent
-    def add(points, label):
-        nonlocal score
-        score += points
-        drivers.append(f"{label} [+{points}]")
+def driver_line(points, label):
+    return f"{label} [+{points}]"
 
-    # -----------------------
-    # CORE CONDITIONS
-    # -----------------------
 
-    if flags.get("cancer"):
-        add(5.0, "Active cancer")
+def medication_label(med_count):
+    return f"Medication burden ({med_count} meds)"
 
-    if flags.get("diabetes"):
-        add(2.5, "Diabetes")
 
-    if flags.get("chf"):
-        add(3.0, "Congestive heart failure")
+def format_explanation(drivers):
+    return "\n".join([f"- {d}" for d in drivers])
 
-    if flags.get("copd"):
-        add(2.0, "COPD")
 
-    if flags.get("heart_disease"):
-        add(2.0, "Heart disease")
+# -----------------------
+# Single case
+# -----------------------
 
-    if flags.get("stroke"):
-        add(2.5, "Stroke history")
+def calculate_score(structured):
 
-    if flags.get("chest_pain"):
-        add(1.5, "Chest Pain")
+    flags = structured.get("flags", {})
+    meds = structured.get("medications", [])
 
-    if flags.get("depression") or flags.get("anxiety"):
-        add(1.5, "Mental health condition")
+    score = 0.0
+    drivers = []
 
-    # -----------------------
-    # MEDICATION COMPLEXITY
-    # -----------------------
+    for rule in CONDITION_RULES:
+        if any(flags.get(flag) for flag in rule["flags"]):
+            score += rule["points"]
+            drivers.append(driver_line(rule["points"], rule["label"]))
 
     med_count = len(meds)
 
     if med_count > 0:
-        med_score = round(med_count * 0.25, 2)
-        add(med_score, f"Medication burden ({med_count} meds)")
-
-    # -----------------------
-    # NORMALIZE SCORE
-    # -----------------------
-
-    score = min(score, 10.0)
+        med_score = round(med_count * MEDICATION_POINTS, 2)
+        score += med_score
+        drivers.append(driver_line(med_score, medication_label(med_count)))
 
-    explanation = "\n".join([f"- {d}" for d in drivers])
+    score = min(score, MAX_SCORE)
 
-    return score, explanation
+    return score, format_explanation(drivers)
@@ -0,0 +1,156 @@
+import numpy as np
+
+from shared.scoring import (
+    CONDITION_RULES,
+    MAX_SCORE,
+    MEDICATION_POINTS,
+    calculate_score,
+    driver_line,
+    format_explanation,
+    medication_label,
+)
+
+
+# -----------------------
+# Columns
+# -----------------------
+# Batch counterpart of shared.scoring.calculate_score for re-scoring
+# many cases at once. Cases are loaded into one boolean column per flag
+# plus a medication count column, every rule is applied to the whole
+# batch in one pass, and the result keeps each rule's points per case.
+
+def rule_flags(rules=CONDITION_RULES):
+
+    names = []
+
+    for rule in rules:
+        for flag in rule["flags"]:
+            if flag not in names:
+                names.append(flag)
+
+    return names
+
+
+def load_columns(cases, rules=CONDITION_RULES):
+    """
+    Columnar view of a list of structured dicts:
+    {"flags": {name: bool array}, "med_count": int array}.
+    """
+
+    flag_names = rule_flags(rules)
+
+    flag_rows = []
+    med_counts = []
+
+    for structured in cases:
+
+        flags = structured.get("flags", {})
+
+        flag_rows.append([bool(flags.get(name)) for name in flag_names])
+        med_counts.append(len(structured.get("medications", [])))
+
+    flag_rows = np.array(flag_rows, dtype=bool).reshape(len(cases), len(flag_names))
+    med_count = np.array(med_counts, dtype=np.int64)
+
+    return {
+        "flags": {name: flag_rows[:, j] for j, name in enumerate(flag_names)},
+        "med_count": med_count
+    }
+
+
+# -----------------------
+# Scoring
+# -----------------------
+
+def score_columns(columns, rules=CONDITION_RULES):
+    """
+    Returns (scores, points, fired). points and fired have one column
+    per condition rule followed by the medication column. Points are
+    added rule by rule, in the same order as calculate_score, so the
+    float sums match it bit for bit.
+    """
+
+    med_count = columns["med_count"]
+
+    fired = np.zeros((len(med_count), len(rules) + 1), dtype=bool)
+
+    for j, rule in enumerate(rules):
+        for flag in rule["flags"]:
+            fired[:, j] |= columns["flags"][flag]
+
+    fired[:, -1] = med_count > 0
+
+    points = np.where(
+        fired,
+        [rule["points"] for rule in rules] + [0.0],
+        0.0
+    )
+
+    points[:, -1] = np.where(fired[:, -1], np.round(med_count * MEDICATION_POINTS, 2), 0.0)
+
+    scores = np.zeros(len(med_count))
+
+    for j in range(points.shape[1]):
+        scores += points[:, j]
+
+    return np.minimum(scores, MAX_SCORE), points, fired
+
+
+def breakdowns(columns, points, fired, rules=CONDITION_RULES):
+    """
+    Per-case driver list: [(label, points), ...] in calculate_score's order.
+    """
+
+    labels = [rule["label"] for rule in rules]
+
+    result = []
+
+    # Row-wise string work; plain lists are much faster to walk than
+    # per-element NumPy indexing.
+    for count, row_points, row_fired in zip(
+        columns["med_count"].tolist(), points.tolist(), fired.tolist()
+    ):
+
+        drivers = [
+            (label, p)
+            for label, p, hit in zip(labels, row_points, row_fired)
+            if hit
+        ]
+
+        if row_fired[-1]:
+            drivers.append((medication_label(count), row_points[-1]))
+
+        result.append(drivers)
+
+    return result
+
+
+def score_batch(cases, rules=CONDITION_RULES):
+    """
+    Score a list of structured dicts. Returns one dict per case with
+    score, explanation (identical to calculate_score) and drivers.
+    """
+
+    columns = load_columns(cases, rules)
+
+    scores, points, fired = score_columns(columns, rules)
+
+    return [
+        {
+            "score": score,
+            "explanation": format_explanation([driver_line(p, label) for label, p in drivers]),
+            "drivers": [{"label": label, "points": p} for label, p in drivers]
+        }
+        for score, drivers in zip(scores.tolist(), breakdowns(columns, points, fired, rules))
+    ]
+
+
+def mismatches(cases, results):
+    """
+    Indexes of cases whose batch result differs from calculate_score.
+    """
+
+    return [
+        i for i, (structured, result) in enumerate(zip(cases, results))
+        if calculate_score(structured) != (result["score"], result["explanation"])
+    ]
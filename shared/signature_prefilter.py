@@ -0,0 +1,137 @@
+import os
+
+import fitz  # PyMuPDF
+
+
+# Text that already proves an electronic signature; no vision call needed.
+ESIGNATURE_PHRASES = (
+    "electronically signed",
+    "digitally signed",
+    "e-signed",
+    "esigned",
+)
+
+# Text that marks a signature area whose ink still has to be checked.
+SIGNATURE_LABELS = (
+    "signature",
+    "signed by",
+    "sign here",
+)
+
+# Fraction of the page height, measured from the bottom, where
+# signatures are expected when no label is found.
+SIGNATURE_REGION_FRACTION = 0.4
+
+# Minimum curve segments before vector drawings look like a signature.
+MIN_DRAWING_CURVES = 8
+
+# Share of inked pixels in the signature region below which a scanned
+# page is treated as blank there. Thin, anti-aliased handwriting covers
+# well under 0.1% of the region, so this only skips regions that are
+# empty but for scanner speckle; anything else goes to the vision model.
+MIN_INK_DENSITY = 0.00005
+
+INK_DPI = 100
+
+# Vertical padding, in points, kept around signature labels when cropping.
+LABEL_PADDING = 72
+
+# Any pixel noticeably darker than paper counts as ink.
+_INK_BYTES = bytes(range(200))
+
+
+def prefilter_enabled():
+    return os.getenv("SIGNATURE_PREFILTER", "1") != "0"
+
+
+def signature_region(page):
+
+    rect = page.rect
+
+    return fitz.Rect(
+        rect.x0,
+        rect.y1 - rect.height * SIGNATURE_REGION_FRACTION,
+        rect.x1,
+        rect.y1
+    )
+
+
+def signature_clip(page):
+    """
+    Smallest rectangle covering the bottom signature region and every
+    signature label found on the page, padded to catch the ink beside it.
+    """
+
+    clip = signature_region(page)
+
+    for label in SIGNATURE_LABELS + ESIGNATURE_PHRASES:
+        for hit in page.search_for(label):
+            clip |= fitz.Rect(
+                page.rect.x0,
+                hit.y0 - LABEL_PADDING,
+                page.rect.x1,
+                hit.y1 + LABEL_PADDING
+            )
+
+    return clip & page.rect
+
+
+def ink_density(page, clip):
+
+    pix = page.get_pixmap(dpi=INK_DPI, clip=clip, colorspace=fitz.csGRAY)
+
+    samples = pix.samples
+
+    if not samples:
+        return 0.0
+
+    inked = len(samples) - len(samples.translate(None, _INK_BYTES))
+
+    return inked / len(samples)
+
+
+def classify_page(page):
+    """
+    Decide locally whether a page needs the vision model.
+
+    Returns (decision, reason) where decision is "signed", "unsigned"
+    or "candidate". Only candidates are sent to the vision deployment.
+    """
+
+    text = page.get_text("text").lower()
+
+    for phrase in ESIGNATURE_PHRASES:
+        if phrase in text:
+            return "signed", f"text: {phrase}"
+
+    for label in SIGNATURE_LABELS:
+        if label in text:
+            return "candidate", f"label: {label}"
+
+    region = signature_region(page)
+
+    curves = 0
+
+    for drawing in page.get_drawings():
+        if fitz.Rect(drawing["rect"]).intersects(region):
+            curves += sum(1 for item in drawing["items"] if item[0] == "c")
+
+    if curves >= MIN_DRAWING_CURVES:
+        return "candidate", f"vector strokes: {curves}"
+
+    images = [
+        fitz.Rect(info["bbox"])
+        for info in page.get_image_info()
+        if fitz.Rect(info["bbox"]).intersects(region)
+    ]
+
+    if images:
+
+        density = ink_density(page, region)
+
+        if density < MIN_INK_DENSITY:
+            return "unsigned", f"blank signature region (ink {density:.4f})"
+
+        return "candidate", f"ink in signature region ({density:.4f})"
+
+    return "unsigned", "no signature markers"
@@ -1,14 +1,7 @@
-import base64
 import os
-from openai import AzureOpenAI
 
-
-def get_openai_client():
-    return AzureOpenAI(
-        api_key=os.getenv("OPENAI_KEY"),
-        azure_endpoint=os.getenv("OPENAI_ENDPOINT"),
-        api_version="2024-02-15-preview"
-    )
+from shared.clients import get_openai_client
+from shared.llm_governor import chat_completion
 
 
 def detect_signature_from_image(image_base64: str) -> bool:
@@ -26,7 +19,8 @@ Respond ONLY with JSON:
 }
 """
 
-    response = client.chat.completions.create(
+    response = chat_completion(
+        client,
         model=deployment,
         messages=[
             {
@@ -0,0 +1,91 @@
+import os
+
+import fitz  # PyMuPDF
+
+from shared.concurrency import env_int
+
+
+# Share of characters that must be ordinary printable text before a
+# text layer is trusted; broken font encodings show up as U+FFFD or
+# control characters.
+MIN_PRINTABLE_RATIO = 0.9
+
+# Share of the page area covered by images above which the page is sent
+# to OCR whatever its text layer holds. A scanned page can still carry a
+# fax-server stamp or similar overlay as real text.
+MAX_IMAGE_COVERAGE = 0.5
+
+
+def text_layer_enabled():
+    return os.getenv("TEXT_LAYER", "1") != "0"
+
+
+def image_coverage(page):
+
+    page_area = page.rect.get_area()
+
+    if not page_area:
+        return 0.0
+
+    # Overlapping images are counted twice; that only errs towards OCR.
+    covered = sum(
+        (fitz.Rect(info["bbox"]) & page.rect).get_area()
+        for info in page.get_image_info()
+    )
+
+    return min(covered / page_area, 1.0)
+
+
+def usable_page_lines(page, min_chars):
+    """
+    Lines of the page's embedded text layer, or None when the page
+    looks scanned or image-only and needs OCR.
+    """
+
+    if image_coverage(page) > MAX_IMAGE_COVERAGE:
+        return None
+
+    text = page.get_text("text", sort=True)
+
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+
+    chars = sum(len(line) for line in lines)
+
+    if chars < min_chars:
+        return None
+
+    printable = sum(
+        1 for line in lines for ch in line
+        if ch.isprintable() and ch != "�"
+    )
+
+    if printable / chars < MIN_PRINTABLE_RATIO:
+        return None
+
+    return lines
+
+
+def split_text_layer(pdf_bytes):
+    """
+    Returns (doc, pages) where pages[i] holds the local lines for page i,
+    or None where the page must go to Document Intelligence. doc is None
+    when the input is not a PDF PyMuPDF can open.
+    """
+
+    try:
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    except Exception:
+        return None, None
+
+    min_chars = env_int("TEXT_LAYER_MIN_CHARS", 80)
+
+    pages = [usable_page_lines(page, min_chars) for page in doc]
+
+    return doc, pages
+
+
+def subset_pdf(doc, page_indexes) -> bytes:
+
+    doc.select(page_indexes)
+
+    return doc.tobytes(garbage=1, deflate=True)
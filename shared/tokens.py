@@ -0,0 +1,26 @@
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
+
+_encoding = None
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Prompt token count for text. Uses tiktoken when it is installed,
+    otherwise the usual ~4 characters per token approximation.
+    """
+
+    global _encoding
+
+    if not text:
+        return 0
+
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        return len(_encoding.encode(text))
+
+    return (len(text) + 3) // 4
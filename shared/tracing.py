@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from functools import wraps
+from contextlib import contextmanager, nullcontext
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # pragma: no cover - optional dependency
+    otel_trace = None
+
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+# -----------------------
+# Trace
+# -----------------------
+
+class Trace:
+    """
+    Spans and counters for one request. Worker threads see the trace
+    as long as they are started through shared.concurrency, which
+    copies the caller's context.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.spans = []
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def summary(self):
+        """
+        Per-stage totals, suitable for a debug field in a response.
+        """
+
+        stages = {}
+
+        with self._lock:
+            spans = list(self.spans)
+            counters = dict(self.counters)
+
+        for span in spans:
+            ms = (span["end_time_unix_nano"] - span["start_time_unix_nano"]) / 1e6
+            stage = stages.setdefault(span["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            stage["count"] += 1
+            stage["total_ms"] = round(stage["total_ms"] + ms, 1)
+            stage["max_ms"] = round(max(stage["max_ms"], ms), 1)
+
+        end_ns = self.end_ns or time.time_ns()
+
+        return {
+            "trace_id": self.trace_id,
+            "total_ms": round((end_ns - self.start_ns) / 1e6, 1),
+            "stages": stages,
+            "counters": counters
+        }
+
+    def export(self):
+        """
+        Spans in OpenTelemetry's span field layout.
+        """
+
+        with self._lock:
+            return [dict(span, trace_id=self.trace_id) for span in self.spans]
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace(name):
+    """
+    Collect spans and counters for one request, then export them
+    according to TRACE_EXPORT: "summary" (default) logs one structured
+    line, "spans" logs every span, "none" disables logging.
+    """
+
+    trace = Trace(name)
+    token = _current_trace.set(trace)
+
+    try:
+        with span(name):
+            yield trace
+    finally:
+        trace.end_ns = time.time_ns()
+        _current_trace.reset(token)
+        export_trace(trace)
+
+
+def export_trace(trace):
+
+    mode = os.getenv("TRACE_EXPORT", "summary")
+
+    if mode == "summary":
+        logging.info("trace %s %s", trace.name, json.dumps(trace.summary()))
+    elif mode == "spans":
+        for record in trace.export():
+            logging.info("span %s", json.dumps(record))
+
+
+# -----------------------
+# Spans and counters
+# -----------------------
+
+@contextmanager
+def span(name, **attributes):
+
+    trace = _current_trace.get()
+
+    otel = (
+        otel_trace.get_tracer("orderscannerai").start_as_current_span(name, attributes=attributes)
+        if otel_trace is not None else nullcontext()
+    )
+
+    if trace is None:
+        with otel:
+            yield attributes
+        return
+
+    span_id = uuid.uuid4().hex[:16]
+    parent = _current_span.get()
+    token = _current_span.set(span_id)
+    start_ns = time.time_ns()
+
+    try:
+        with otel:
+            yield attributes
+    finally:
+        _current_span.reset(token)
+        trace.add_span({
+            "name": name,
+            "span_id": span_id,
+            "parent_span_id": parent,
+            "start_time_unix_nano": start_ns,
+            "end_time_unix_nano": time.time_ns(),
+            "attributes": attributes
+        })
+
+
+def count(name, amount=1):
+
+    trace = _current_trace.get()
+
+    if trace is not None:
+        trace.count(name, amount)
+
+
+def traced(name):
+    """
+    Decorator form of span().
+    """
+
+    def decorate(fn):
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def wants_debug(req):
+    return req.params.get("debug", "").lower() in ("1", "true", "yes")
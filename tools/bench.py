@@ -0,0 +1,258 @@
+"""
+Load benchmark for scan.run_scanner and UnderwritingAI.main.
+
+    python -m tools.bench --target scan --pages 20 --requests 40 --concurrency 4
+    python -m tools.bench --target underwriting --mode both --latency-ms 400
+
+By default it starts tools.fake_azure in-process and points the apps at
+it, so no quota is used; --no-fake keeps the current environment and
+hits the real endpoints. Every request gets a distinct synthetic PDF and
+the result caches are switched off, so cache hits do not hide the work:
+the fake returns the same OCR lines for every page, which would
+otherwise make the page and extraction caches hit across documents.
+--repeat reuses one document with the caches on to measure warm runs.
+"""
+
+import os
+import sys
+import time
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz  # PyMuPDF
+
+from tools.fake_azure import start_server
+
+
+# -----------------------
+# Synthetic documents
+# -----------------------
+
+def page_kinds(pages, seed=0, scanned_ratio=0.5, signed_ratio=0.3):
+    """
+    (signed, scanned) for each page synthetic_pdf builds with the same
+    arguments.
+    """
+
+    return [
+        (
+            (page_index * 7 + seed) % 10 < signed_ratio * 10,
+            (page_index * 3 + seed) % 10 < scanned_ratio * 10
+        )
+        for page_index in range(pages)
+    ]
+
+
+def synthetic_pdf(pages, seed=0, scanned_ratio=0.5, signed_ratio=0.3):
+    """
+    Multi-page order packet. A share of pages is rasterized to an
+    image-only page so it has no text layer and needs OCR.
+    """
+
+    doc = fitz.open()
+
+    kinds = page_kinds(pages, seed, scanned_ratio, signed_ratio)
+
+    for page_index, (signed, scanned) in enumerate(kinds):
+
+        page = doc.new_page()
+
+        lines = [
+            f"LABORATORY ORDER #{seed}-{page_index + 1}",
+            f"Patient: Synthetic Patient {seed}  DOB: 01/02/1960",
+            "Tests: CBC, CMP, Hemoglobin A1c, Lipid panel",
+            "Diagnosis: E11.9 Type 2 diabetes mellitus; I10 Essential hypertension",
+            "Ordering provider: John Sample, MD  NPI 1234567890",
+            f"Order date: 03/{page_index % 28 + 1:02d}/2024",
+        ]
+
+        page.insert_text((72, 72), "\n".join(lines), fontsize=11)
+
+        if signed:
+            page.insert_text((72, 720), "Physician signature:", fontsize=11)
+            page.draw_bezier((200, 720), (230, 690), (260, 750), (300, 715))
+            page.draw_bezier((300, 715), (320, 700), (340, 730), (360, 712))
+
+        if scanned:
+            pix = page.get_pixmap(dpi=100)
+            image_page = doc.new_page(pno=page_index, width=page.rect.width, height=page.rect.height)
+            image_page.insert_image(image_page.rect, pixmap=pix)
+            doc.delete_page(page_index + 1)
+
+    return doc.tobytes(garbage=1, deflate=True)
+
+
+# -----------------------
+# Targets
+# -----------------------
+
+def scan_target(pdf_bytes, mode):
+
+    import scan
+
+    scan.run_scanner(pdf_bytes)
+
+
+def underwriting_target(pdf_bytes, mode):
+
+    import azure.functions as func
+    import UnderwritingAI
+
+    response = UnderwritingAI.main(func.HttpRequest(
+        method="POST",
+        url="/api/UnderwritingAI",
+        body=pdf_bytes,
+        params={"mode": mode}
+    ))
+
+    if response.status_code != 200:
+        raise RuntimeError(response.get_body().decode(errors="replace")[:500])
+
+
+TARGETS = {
+    "scan": scan_target,
+    "underwriting": underwriting_target,
+}
+
+
+# -----------------------
+# Runner
+# -----------------------
+
+def percentile(values, pct):
+
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def run_benchmark(target, documents, concurrency, mode):
+
+    latencies = []
+    errors = []
+
+    def one(pdf_bytes):
+        start = time.perf_counter()
+        try:
+            target(pdf_bytes, mode)
+        except Exception as e:
+            errors.append(repr(e))
+            return None
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for latency in pool.map(one, documents):
+            if latency is not None:
+                latencies.append(latency)
+
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(documents),
+        "succeeded": len(latencies),
+        "failed": len(errors),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "max_ms": round(max(latencies), 1) if latencies else 0.0,
+        "first_error": errors[0] if errors else None,
+    }
+
+
+# Caches built through shared.cache.build_cache; a zero-entry memory
+# backend drops everything it is given.
+CACHE_PREFIXES = ("OCR", "EXTRACT", "PAGE_ORDER", "PAGE_SIGNATURE")
+
+
+def disable_caches():
+    """
+    Must run before the targets are imported; the caches are built at
+    import time.
+    """
+
+    for prefix in CACHE_PREFIXES:
+        os.environ[f"{prefix}_CACHE_MAX_ENTRIES"] = "0"
+        os.environ.pop(f"{prefix}_CACHE_DIR", None)
+
+
+def configure_fake(args):
+
+    server, fake = start_server(
+        0,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        rate_limit=args.rate_limit,
+        retry_after=args.retry_after
+    )
+
+    endpoint = f"http://127.0.0.1:{server.server_address[1]}"
+
+    os.environ.update({
+        "DOC_INTEL_ENDPOINT": endpoint,
+        "DOC_INTEL_KEY": "fake",
+        "OPENAI_ENDPOINT": endpoint,
+        "OPENAI_KEY": "fake",
+        "OPENAI_API_KEY": "fake",
+        "OPENAI_DEPLOYMENT": "fake",
+        "OPENAI_VISION_DEPLOYMENT": "fake-vision",
+    })
+
+    return fake
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Benchmark scan / UnderwritingAI")
+    parser.add_argument("--target", choices=sorted(TARGETS), default="scan")
+    parser.add_argument("--mode", default="both", help="UnderwritingAI mode")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--scanned-ratio", type=float, default=0.5)
+    parser.add_argument("--repeat", action="store_true", help="reuse one document for every request, caches on")
+    parser.add_argument("--no-fake", action="store_true", help="use the real endpoints from the environment")
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--rate-limit", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if not args.repeat:
+        disable_caches()
+
+    fake = None if args.no_fake else configure_fake(args)
+
+    documents = [
+        synthetic_pdf(args.pages, seed=0 if args.repeat else i, scanned_ratio=args.scanned_ratio)
+        for i in range(args.requests)
+    ]
+
+    report = run_benchmark(TARGETS[args.target], documents, args.concurrency, args.mode)
+
+    report.update(
+        target=args.target,
+        pages=args.pages,
+        concurrency=args.concurrency,
+        document_bytes=sum(len(d) for d in documents) // len(documents),
+    )
+
+    if fake is not None:
+        report["fake_calls"] = dict(fake.counts)
+
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
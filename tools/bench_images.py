@@ -0,0 +1,125 @@
+"""
+Peak-memory benchmark for shared.pdf_to_images.
+
+    python -m tools.bench_images --pages 60 --dpi 200
+
+Each variant runs in a fresh process so its peak RSS is its own:
+
+    stream     iter_base64_images, one page alive at a time
+    list       pdf_bytes_to_base64_images, every page kept
+    pdf2image  the former convert_from_bytes implementation (only when
+               pdf2image and poppler are installed)
+"""
+
+import sys
+import json
+import time
+import base64
+import resource
+import argparse
+import tracemalloc
+import multiprocessing
+from io import BytesIO
+
+from tools.bench import synthetic_pdf
+
+
+def _rss_mb():
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_stream(pdf_bytes, dpi):
+
+    from shared.pdf_to_images import iter_base64_images
+
+    pages = 0
+
+    for _ in iter_base64_images(pdf_bytes, dpi=dpi):
+        pages += 1
+
+    return pages
+
+
+def _run_list(pdf_bytes, dpi):
+
+    from shared.pdf_to_images import pdf_bytes_to_base64_images
+
+    return len(pdf_bytes_to_base64_images(pdf_bytes, dpi=dpi))
+
+
+def _run_pdf2image(pdf_bytes, dpi):
+
+    from pdf2image import convert_from_bytes
+
+    images = []
+
+    for image in convert_from_bytes(pdf_bytes, dpi=dpi):
+        buffer = BytesIO()
+        image.save(buffer, format="PNG")
+        images.append(base64.b64encode(buffer.getvalue()).decode())
+
+    return len(images)
+
+
+VARIANTS = {
+    "stream": _run_stream,
+    "list": _run_list,
+    "pdf2image": _run_pdf2image,
+}
+
+
+def _measure(variant, pdf_bytes, dpi, results):
+
+    baseline = _rss_mb()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    try:
+        pages = VARIANTS[variant](pdf_bytes, dpi)
+    except ImportError as e:
+        results.put({"variant": variant, "skipped": str(e)})
+        return
+
+    elapsed = time.perf_counter() - start
+    _, heap_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    results.put({
+        "variant": variant,
+        "pages": pages,
+        "elapsed_s": round(elapsed, 3),
+        "peak_rss_mb": round(_rss_mb(), 1),
+        "rss_growth_mb": round(_rss_mb() - baseline, 1),
+        "python_heap_peak_mb": round(heap_peak / (1024 * 1024), 1),
+    })
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Peak memory of page image rendering")
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--dpi", type=int, default=200)
+    parser.add_argument("--variants", default="stream,list,pdf2image")
+    args = parser.parse_args(argv)
+
+    pdf_bytes = synthetic_pdf(args.pages, scanned_ratio=1.0)
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    report = []
+
+    for variant in args.variants.split(","):
+
+        process = context.Process(target=_measure, args=(variant, pdf_bytes, args.dpi, results))
+        process.start()
+        report.append(results.get())
+        process.join()
+
+    json.dump({"pages": args.pages, "dpi": args.dpi, "results": report}, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
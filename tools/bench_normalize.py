@@ -0,0 +1,152 @@
+"""
+Benchmark for shared.normalize on large OCR texts.
+
+    python -m tools.bench_normalize --megabytes 5 --extra-terms 500
+
+Compares the compiled TermMatcher against the two approaches it
+replaces, each run over the same text and vocabulary:
+
+    substring       one `in` check per synonym on the lowercased text
+                    (the original approach; no offsets, no word boundaries)
+    per_term_regex  one word-boundary regex scan per synonym
+    compiled        TermMatcher: a single pass with offsets
+
+--extra-terms adds generated drug names to model a vocabulary of
+hundreds of entries.
+"""
+
+import re
+import sys
+import json
+import time
+import random
+import argparse
+
+from shared.normalize import MEDICAL_TERMS, TermMatcher
+
+
+FILLER = (
+    "patient", "seen", "today", "for", "follow", "up", "denies", "reports",
+    "stable", "plan", "continue", "current", "regimen", "labs", "reviewed",
+    "history", "of", "and", "with", "no", "acute", "distress", "vitals",
+    "within", "normal", "limits", "return", "in", "months", "page", "fax",
+    "admin", "lightning", "mild", "dmv", "casa", "madam",
+)
+
+
+def synthetic_vocabulary(extra_terms, seed=0):
+
+    rng = random.Random(seed)
+    terms = dict(MEDICAL_TERMS)
+
+    for i in range(extra_terms):
+        name = "".join(rng.choice("bcdfglmnprstvxz") + rng.choice("aeiou") for _ in range(4)) + "ine"
+        terms[f"Drug {i} {name.title()}"] = ("medication", (name, f"{name} er"))
+
+    return terms
+
+
+def synthetic_text(megabytes, terms, seed=0, term_rate=0.02):
+
+    rng = random.Random(seed)
+    synonyms = [synonym for _, names in terms.values() for synonym in names]
+
+    words = []
+    size = 0
+    target = int(megabytes * 1024 * 1024)
+
+    while size < target:
+        word = rng.choice(synonyms) if rng.random() < term_rate else rng.choice(FILLER)
+        words.append(word)
+        size += len(word) + 1
+        if rng.random() < 0.08:
+            words.append("\n")
+
+    return " ".join(words)
+
+
+# -----------------------
+# Variants
+# -----------------------
+
+def run_substring(text, terms):
+
+    text_lower = text.lower()
+
+    return sum(
+        1
+        for _, synonyms in terms.values()
+        for synonym in synonyms
+        if synonym.lower() in text_lower
+    )
+
+
+def run_per_term_regex(text, terms):
+
+    matches = 0
+
+    for _, synonyms in terms.values():
+        for synonym in synonyms:
+            pattern = re.compile(r"(?<!\w)" + re.escape(synonym) + r"(?!\w)", re.IGNORECASE)
+            matches += sum(1 for _ in pattern.finditer(text))
+
+    return matches
+
+
+def run_compiled(text, terms, matcher=None):
+    return len((matcher or TermMatcher(terms)).find(text))
+
+
+def timed_run(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, round((time.perf_counter() - start) * 1000, 1)
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Benchmark medical term matching")
+    parser.add_argument("--megabytes", type=float, default=2.0)
+    parser.add_argument("--extra-terms", type=int, default=300)
+    parser.add_argument("--skip-per-term", action="store_true", help="skip the slowest variant")
+    args = parser.parse_args(argv)
+
+    terms = synthetic_vocabulary(args.extra_terms)
+    text = synthetic_text(args.megabytes, terms)
+
+    matcher, compile_ms = timed_run(TermMatcher, terms)
+
+    report = {
+        "text_mb": round(len(text) / (1024 * 1024), 2),
+        "canonical_terms": len(terms),
+        "synonyms": sum(len(names) for _, names in terms.values()),
+        "compile_ms": compile_ms,
+        "results": {}
+    }
+
+    variants = [
+        ("substring", run_substring, (text, terms)),
+        ("per_term_regex", run_per_term_regex, (text, terms)),
+        ("compiled", run_compiled, (text, terms, matcher)),
+    ]
+
+    for name, fn, fn_args in variants:
+
+        if name == "per_term_regex" and args.skip_per_term:
+            continue
+
+        result, ms = timed_run(fn, *fn_args)
+
+        report["results"][name] = {
+            "ms": ms,
+            "ms_per_mb": round(ms / max(report["text_mb"], 0.01), 1),
+            # substring counts terms present; the others count matches.
+            "count": result
+        }
+
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Regression check for scan's per-page order results.
+
+    python -m tools.check_order_pages
+
+Runs scan.extract_orders with the model call replaced by canned replies
+that leave out page_number, send it as a string, or echo another page's
+number, and fails unless every page still gets its own answer under the
+page number that was asked for. Needs no Azure endpoint.
+"""
+
+import os
+import sys
+import json
+
+import scan
+
+
+REPLIES = {
+    "missing": lambda page_number: {},
+    "string": lambda page_number: {"page_number": str(page_number)},
+    "wrong": lambda page_number: {"page_number": page_number % 3 + 1},
+}
+
+
+def check_reply(name, make_reply, pages=3, batch_pages=1):
+
+    def ask_openai_for_fields(page_number, page_text):
+        return dict(make_reply(page_number), is_order=True, tests_or_procedures=[page_text])
+
+    def ask_openai_for_fields_batch(batch):
+        raise ValueError("batch call disabled for this check")
+
+    scan.ask_openai_for_fields = ask_openai_for_fields
+    scan.ask_openai_for_fields_batch = ask_openai_for_fields_batch
+    scan._order_cache = scan.build_cache("CHECK_ORDER", 0)
+
+    ocr_pages = [[f"Order {name} {batch_pages} page {n}"] for n in range(1, pages + 1)]
+
+    try:
+        results = scan.extract_orders(ocr_pages)
+    except Exception as e:
+        return [f"{name}: {e!r}"]
+
+    failures = []
+
+    for page_number, fields in enumerate(results, start=1):
+        if fields.get("page_number") != page_number or fields.get("tests_or_procedures") != ocr_pages[page_number - 1]:
+            failures.append(f"{name}: page {page_number} got {fields!r}")
+
+    return failures
+
+
+def main():
+
+    # Single-page batches and the batch fallback both go through
+    # ask_page_or_report.
+    os.environ["OCR_COMPACT"] = "0"
+
+    failures = []
+
+    for batch_pages in ("1", "8"):
+        os.environ["SCAN_BATCH_MAX_PAGES"] = batch_pages
+        for name, make_reply in REPLIES.items():
+            failures.extend(check_reply(name, make_reply, batch_pages=batch_pages))
+
+    json.dump({"failures": failures}, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
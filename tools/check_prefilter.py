@@ -0,0 +1,83 @@
+"""
+Regression check for the local signature prefilter.
+
+    python -m tools.check_prefilter --pages 10 --seeds 0-9
+
+Builds the benchmark's synthetic packets and fails if any signed page,
+scanned or not, is settled locally as "unsigned"; those pages would
+never reach the vision model. Also reports how many unsigned scanned
+pages the prefilter still skips.
+"""
+
+import sys
+import json
+import argparse
+
+import fitz  # PyMuPDF
+
+from shared.signature_prefilter import classify_page
+from tools.bench import page_kinds, synthetic_pdf
+
+
+def check(pages, seeds, scanned_ratio, signed_ratio):
+
+    failures = []
+    skipped_unsigned = 0
+    unsigned_scanned = 0
+
+    for seed in seeds:
+
+        kinds = page_kinds(pages, seed, scanned_ratio, signed_ratio)
+        doc = fitz.open(stream=synthetic_pdf(pages, seed, scanned_ratio, signed_ratio), filetype="pdf")
+
+        for page_index, (signed, scanned) in enumerate(kinds):
+
+            decision, reason = classify_page(doc.load_page(page_index))
+
+            if signed and decision == "unsigned":
+                failures.append({
+                    "seed": seed,
+                    "page": page_index + 1,
+                    "scanned": scanned,
+                    "reason": reason
+                })
+
+            if scanned and not signed:
+                unsigned_scanned += 1
+                skipped_unsigned += decision == "unsigned"
+
+    return {
+        "failures": failures,
+        "unsigned_scanned_pages": unsigned_scanned,
+        "unsigned_scanned_skipped": skipped_unsigned
+    }
+
+
+def parse_seeds(value):
+
+    if "-" in value:
+        first, last = value.split("-", 1)
+        return range(int(first), int(last) + 1)
+
+    return [int(seed) for seed in value.split(",")]
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Check the signature prefilter on synthetic packets")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--seeds", default="0-9")
+    parser.add_argument("--scanned-ratio", type=float, default=0.5)
+    parser.add_argument("--signed-ratio", type=float, default=0.3)
+    args = parser.parse_args(argv)
+
+    report = check(args.pages, parse_seeds(args.seeds), args.scanned_ratio, args.signed_ratio)
+
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+    return 1 if report["failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,376 @@
+"""
+Local stand-in for the Document Intelligence layout endpoint and the
+Azure OpenAI chat completions endpoint.
+
+    python -m tools.fake_azure --port 8765 --latency-ms 300 --rate-limit 0.05
+
+then point the apps at it:
+
+    DOC_INTEL_ENDPOINT=http://127.0.0.1:8765  DOC_INTEL_KEY=fake
+    OPENAI_ENDPOINT=http://127.0.0.1:8765     OPENAI_KEY=fake
+    OPENAI_DEPLOYMENT=fake  OPENAI_VISION_DEPLOYMENT=fake-vision
+
+Replies are canned but shaped like the real services, chosen from the
+prompt (signature check, page orders, structured extraction, summary).
+"""
+
+import re
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import fitz  # PyMuPDF
+
+
+ANALYZE_PATH = re.compile(r"^/documentintelligence/documentModels/([^/:]+):analyze$")
+RESULT_PATH = re.compile(r"^/documentintelligence/documentModels/([^/]+)/analyzeResults/([^/]+)$")
+CHAT_PATH = re.compile(r"^/openai/deployments/([^/]+)/chat/completions$")
+
+CANNED_PAGE_LINES = [
+    "LABORATORY ORDER",
+    "Patient: Jane Example  DOB: 01/02/1960",
+    "Tests: CBC, CMP, Hemoglobin A1c",
+    "Diagnosis: E11.9 Type 2 diabetes mellitus without complications",
+    "Ordering provider: John Sample, MD",
+    "Order date: 03/04/2024",
+]
+
+CANNED_STRUCTURED = {
+    "patient": {
+        "name": "Jane Example",
+        "dob": "1960-01-02",
+        "age": 64,
+        "gender": "female",
+        "race": None,
+        "height": None,
+        "weight": None,
+        "bmi": None,
+        "smoking_status": "never"
+    },
+    "medications": [
+        {"name": "Metformin", "status": "active"},
+        {"name": "Lisinopril", "status": "active"}
+    ],
+    "providers": [
+        {"name": "John Sample, MD", "specialty": "Internal Medicine", "address": ""}
+    ],
+    "diagnoses": ["Type 2 diabetes mellitus", "Hypertension"],
+    "icd_codes": ["E11.9", "I10"],
+    "cpt_codes": ["80053", "85025"],
+    "flags": {
+        "diabetes": True,
+        "cancer": False,
+        "copd": False,
+        "chf": False,
+        "heart_disease": False,
+        "stroke": False,
+        "depression": False,
+        "anxiety": False,
+        "chest_pain": False
+    }
+}
+
+CANNED_SUMMARY = (
+    "The patient is a 64-year-old woman with type 2 diabetes mellitus and "
+    "hypertension, managed with metformin and lisinopril. Routine laboratory "
+    "studies were ordered by her primary care physician."
+)
+
+
+def _order(page_number):
+    return {
+        "page_number": page_number,
+        "is_order": True,
+        "order_type": "lab",
+        "tests_or_procedures": ["CBC", "CMP", "Hemoglobin A1c"],
+        "icd10_codes": ["E11.9"],
+        "ordering_provider": "John Sample, MD",
+        "order_date": "2024-03-04",
+        "confidence": 0.92
+    }
+
+
+def _signature(page_number, rng):
+    return {
+        "page_number": page_number,
+        "signature_present": rng.random() < 0.3,
+        "confidence": 0.9
+    }
+
+
+def chat_reply(messages, rng):
+    """
+    Pick a canned reply for a chat completions request.
+    """
+
+    texts = []
+    images = 0
+
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            texts.append(content)
+        else:
+            for part in content or []:
+                if part.get("type") == "text":
+                    texts.append(part.get("text", ""))
+                elif part.get("type") == "image_url":
+                    images += 1
+
+    text = "\n".join(texts)
+
+    if images > 1:
+        pages = [int(n) for n in re.findall(r"^Page (\d+):", text, re.MULTILINE)]
+        return json.dumps([_signature(n, rng) for n in pages])
+
+    if images == 1:
+        entry = _signature(1, rng)
+        entry.pop("page_number")
+        return json.dumps(entry)
+
+    if "=== PAGE" in text:
+        pages = [int(n) for n in re.findall(r"=== PAGE (\d+) ===", text)]
+        return json.dumps([_order(n) for n in pages])
+
+    match = re.search(r'"page_number": (\d+)', text)
+    if match:
+        return json.dumps(_order(int(match.group(1))))
+
+    if "Extract structured medical data" in text:
+        return json.dumps(CANNED_STRUCTURED)
+
+    return CANNED_SUMMARY
+
+
+def count_pages(body):
+    try:
+        return len(fitz.open(stream=body, filetype="pdf"))
+    except Exception:
+        return 1
+
+
+def analyze_result(model_id, page_count):
+
+    pages = []
+    offset = 0
+
+    for page_number in range(1, page_count + 1):
+
+        lines = []
+
+        for content in CANNED_PAGE_LINES:
+            lines.append({
+                "content": content,
+                "polygon": [0, 0, 1, 0, 1, 1, 0, 1],
+                "spans": [{"offset": offset, "length": len(content)}]
+            })
+            offset += len(content) + 1
+
+        pages.append({
+            "pageNumber": page_number,
+            "angle": 0,
+            "width": 8.5,
+            "height": 11,
+            "unit": "inch",
+            "spans": [],
+            "lines": lines
+        })
+
+    return {
+        "status": "succeeded",
+        "createdDateTime": "2024-01-01T00:00:00Z",
+        "lastUpdatedDateTime": "2024-01-01T00:00:00Z",
+        "analyzeResult": {
+            "apiVersion": "2024-11-30",
+            "modelId": model_id,
+            "stringIndexType": "textElements",
+            "content": "",
+            "pages": pages
+        }
+    }
+
+
+class FakeAzure:
+
+    def __init__(self, latency_ms=0, jitter_ms=0, rate_limit=0.0, retry_after=1, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.results = {}
+        self.counts = {"analyze": 0, "chat": 0, "throttled": 0}
+        self.lock = threading.Lock()
+
+    def delay(self):
+        with self.lock:
+            ms = self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms)
+        if ms > 0:
+            time.sleep(ms / 1000.0)
+
+    def throttled(self):
+        with self.lock:
+            hit = self.rng.random() < self.rate_limit
+            if hit:
+                self.counts["throttled"] += 1
+        return hit
+
+
+def make_handler(fake):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, payload=None, headers=None):
+            body = b"" if payload is None else json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return self.rfile.read(length) if length else b""
+
+        def _throttle(self):
+            self._send(
+                429,
+                {"error": {"code": "429", "message": "Rate limit is exceeded."}},
+                {"Retry-After": str(fake.retry_after)}
+            )
+
+        def do_POST(self):
+
+            path = urlparse(self.path).path
+            body = self._body()
+
+            match = ANALYZE_PATH.match(path)
+            if match:
+                if fake.throttled():
+                    return self._throttle()
+                result_id = uuid.uuid4().hex
+                with fake.lock:
+                    fake.counts["analyze"] += 1
+                    fake.results[result_id] = (time.monotonic(), match.group(1), count_pages(body))
+                host = self.headers.get("Host")
+                location = (
+                    f"http://{host}/documentintelligence/documentModels/"
+                    f"{match.group(1)}/analyzeResults/{result_id}?api-version=2024-11-30"
+                )
+                return self._send(202, None, {
+                    "Operation-Location": location,
+                    "Retry-After": "0"
+                })
+
+            match = CHAT_PATH.match(path)
+            if match:
+                fake.delay()
+                if fake.throttled():
+                    return self._throttle()
+                with fake.lock:
+                    fake.counts["chat"] += 1
+                request = json.loads(body or b"{}")
+                with fake.lock:
+                    content = chat_reply(request.get("messages", []), fake.rng)
+                prompt_chars = len(json.dumps(request.get("messages", [])))
+                return self._send(200, {
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": match.group(1),
+                    "choices": [{
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": content}
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_chars // 4,
+                        "completion_tokens": len(content) // 4,
+                        "total_tokens": (prompt_chars + len(content)) // 4
+                    }
+                })
+
+            self._send(404, {"error": {"code": "NotFound", "message": path}})
+
+        def do_GET(self):
+
+            path = urlparse(self.path).path
+
+            match = RESULT_PATH.match(path)
+            if not match:
+                return self._send(404, {"error": {"code": "NotFound", "message": path}})
+
+            with fake.lock:
+                entry = fake.results.get(match.group(2))
+
+            if entry is None:
+                return self._send(404, {"error": {"code": "NotFound", "message": path}})
+
+            started, model_id, page_count = entry
+
+            # Layout analysis "runs" for the configured latency per request.
+            remaining = fake.latency_ms / 1000.0 - (time.monotonic() - started)
+            if remaining > 0:
+                return self._send(200, {"status": "running"}, {"Retry-After": "0"})
+
+            self._send(200, analyze_result(model_id, page_count))
+
+    return Handler
+
+
+def start_server(port=0, **options):
+    """
+    Start the fake in a daemon thread. Returns (server, fake); the bound
+    address is server.server_address.
+    """
+
+    fake = FakeAzure(**options)
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(fake))
+    server.daemon_threads = True
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server, fake
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+
+    server, _ = start_server(
+        args.port,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        rate_limit=args.rate_limit,
+        retry_after=args.retry_after
+    )
+
+    print(f"fake Azure endpoints on http://127.0.0.1:{server.server_address[1]}")
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Re-score stored structured extractions without calling Azure.
+
+    python -m tools.rescore extractions.jsonl -o rescored.jsonl
+    python -m tools.rescore extractions/ --workers 8 --no-summary
+
+Input is a JSONL file (one record per line) or a directory of .json
+files (one record each). A record is either the structured dict that
+extract_structured_data returns, or {"id": ..., "structured": {...},
+"summary": "..."}; a stored summary paragraph is reused as is.
+
+Each output line holds the score, the explanation calculate_score
+would give, the per-driver breakdown and, unless --no-summary, the
+deterministic sections of generate_clinical_summary. Lines are written
+in input order as each chunk finishes, so a long run can be followed
+(or resumed from) while it is going.
+"""
+
+import os
+import sys
+import json
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from shared.clinical_summary import generate_clinical_summary
+from shared.scoring import calculate_score
+from shared.scoring_engine import score_batch
+
+
+OFFLINE_SUMMARY = "Summary not regenerated (offline re-score)."
+
+
+# -----------------------
+# Input
+# -----------------------
+
+def iter_records(path):
+    """
+    Yield (record_id, record) pairs; unreadable records come through
+    as (record_id, None) so they are reported rather than dropped.
+    """
+
+    if os.path.isdir(path):
+
+        for name in sorted(os.listdir(path)):
+
+            if not name.endswith(".json"):
+                continue
+
+            try:
+                with open(os.path.join(path, name), "r", encoding="utf-8") as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                record = None
+
+            yield os.path.splitext(name)[0], record
+
+        return
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+
+            if not line.strip():
+                continue
+
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+
+            yield str(line_number), record
+
+
+def chunked(items, size):
+
+    chunk = []
+
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+
+    if chunk:
+        yield chunk
+
+
+# -----------------------
+# Scoring
+# -----------------------
+
+def unwrap(record_id, record):
+    """
+    (record_id, structured, summary, error). error is set, and structured
+    is None, for records the scorers cannot take; such a record becomes
+    an {"id", "error"} line instead of failing its whole chunk.
+    """
+
+    summary = None
+
+    if isinstance(record, dict) and isinstance(record.get("structured"), dict):
+        record_id, summary, record = record.get("id", record_id), record.get("summary"), record["structured"]
+
+    if not isinstance(record, dict):
+        return record_id, None, None, "not a structured extraction record"
+
+    # Missing keys are fine (the scorers default them); present keys must
+    # have the shape extract_structured_data produces, null included.
+    for key, kind, label in (("flags", dict, "an object"), ("medications", list, "a list")):
+        if key in record and not isinstance(record[key], kind):
+            return record_id, None, None, f"'{key}' must be {label}"
+
+    return record_id, record, summary, None
+
+
+def rescore_chunk(chunk, engine="batch", with_summary=True):
+    """
+    Score one chunk of (record_id, record) pairs. Runs in a worker process.
+    """
+
+    rows = [unwrap(record_id, record) for record_id, record in chunk]
+
+    valid = [structured for _, structured, _, error in rows if error is None]
+
+    if engine == "batch":
+        scored = score_batch(valid)
+    else:
+        scored = []
+        for structured in valid:
+            score, explanation = calculate_score(structured)
+            scored.append({"score": score, "explanation": explanation})
+
+    results = iter(scored)
+    output = []
+
+    for record_id, structured, summary, error in rows:
+
+        if error is not None:
+            output.append({"id": record_id, "error": error})
+            continue
+
+        result = dict(next(results), id=record_id)
+
+        if with_summary:
+            try:
+                result["summary"] = generate_clinical_summary(
+                    structured,
+                    summary=summary or OFFLINE_SUMMARY
+                )
+            except Exception as e:
+                result["summary_error"] = str(e)
+
+        output.append(result)
+
+    return output
+
+
+def rescore(records, out, workers, chunk_size, engine, with_summary):
+    """
+    Stream records through a process pool, writing results in input
+    order. At most two chunks per worker are in flight, so memory stays
+    flat however large the input is.
+    """
+
+    counts = {"records": 0, "errors": 0}
+
+    def write(results):
+        for result in results:
+            out.write(json.dumps(result) + "\n")
+            counts["records"] += 1
+            counts["errors"] += "error" in result
+        out.flush()
+
+    chunks = chunked(records, chunk_size)
+
+    if workers <= 1:
+        for chunk in chunks:
+            write(rescore_chunk(chunk, engine, with_summary))
+        return counts
+
+    pending = deque()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+
+        for chunk in chunks:
+
+            pending.append(pool.submit(rescore_chunk, chunk, engine, with_summary))
+
+            if len(pending) >= workers * 2:
+                write(pending.popleft().result())
+
+        while pending:
+            write(pending.popleft().result())
+
+    return counts
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Re-score stored structured extractions")
+    parser.add_argument("input", help="JSONL file or directory of .json records")
+    parser.add_argument("-o", "--output", help="JSONL output path (default: stdout)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--engine", choices=("batch", "single"), default="batch",
+                        help="NumPy batch scorer or calculate_score per record")
+    parser.add_argument("--no-summary", action="store_true", help="skip the summary sections")
+    args = parser.parse_args(argv)
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+
+    try:
+        counts = rescore(
+            iter_records(args.input),
+            out,
+            workers=args.workers,
+            chunk_size=max(1, args.chunk_size),
+            engine=args.engine,
+            with_summary=not args.no_summary
+        )
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    sys.stderr.write(json.dumps(counts) + "\n")
+
+
+if __name__ == "__main__":
+    main()